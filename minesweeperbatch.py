@@ -0,0 +1,188 @@
+"""
+Headless batch simulation of many minesweeper games across a process pool.
+
+Usage:
+    python minesweeperbatch.py --width 9 --height 9 --bombs 10 --games 100000 --seed 1 --output results.jsonl
+
+Each line of output is a JSON object describing one game.
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import sys
+import time
+from concurrent import futures
+from typing import Callable, Dict, List, Optional, Tuple
+
+import minesweepergame
+import minesweepersolver
+
+# A policy chooses the next move for a game: (`"open"` or `"flag"`, x, y), or `None` to give up.
+policy = Callable[[minesweepergame.game, random.Random],
+                  Optional[Tuple[str, int, int]]]
+
+
+def randomPolicy(board: minesweepergame.game, rng: random.Random) -> Optional[Tuple[str, int, int]]:
+    """
+    Opens a uniformly random unopened, unflagged tile, or flags one once all of them must be bombs.
+    """
+    cells = board.visiblecells
+    # Guessing is cheap while most of the board is unopened; otherwise list the candidates.
+    for _ in range(16):
+        index = rng.randrange(len(cells))
+        if cells[index] == 0:
+            return ("open", index % board.width, index // board.width)
+    unopened = [index for index, state in enumerate(cells) if state == 0]
+    if len(unopened) == 0:
+        return None
+    index = rng.choice(unopened)
+    # Once every unopened tile must be a bomb, the game is won by flagging them.
+    if len(unopened) == board.numbombs - cells.count(-1):
+        return ("flag", index % board.width, index // board.width)
+    return ("open", index % board.width, index // board.width)
+
+
+policies: Dict[str, policy] = {
+    "random": randomPolicy,
+    "solver": minesweepersolver.solverPolicy,
+}
+
+
+def getPolicy(name: str) -> policy:
+    """
+    Finds a policy by its name in `policies`, or as `module:function`.
+    """
+    if name in policies:
+        return policies[name]
+    modulename, _, functionname = name.partition(":")
+    if not functionname:
+        raise ValueError(
+            f"Unknown policy {name!r}. Use one of {sorted(policies)} or module:function.")
+    return getattr(importlib.import_module(modulename), functionname)
+
+
+def playGame(width: int, height: int, bombs: int, seed: int, movepolicy: policy) -> Dict:
+    """
+    Plays a single game to the end with the given policy.
+
+    Returns a `dict` with the seed, whether it was won, the number of moves made, and the wall time in seconds.
+    """
+    start = time.perf_counter()
+    board = minesweepergame.game(width, height, bombs, seed)
+    rng = random.Random(f"policy-{seed}")
+    moves = 0
+    # A policy that never finishes the game (e.g. toggling a flag forever) is stopped eventually.
+    maxmoves = 4 * board.width * board.height
+    while not board.isGameOver() and not board.isVictory() and moves < maxmoves:
+        move = movepolicy(board, rng)
+        if move is None:
+            break
+        op, x, y = move
+        if op == "open":
+            board.openCells(x, y)
+        elif op == "flag":
+            board.flag(x, y)
+        else:
+            raise ValueError(f"Unknown move {op!r} from policy.")
+        moves += 1
+    return {
+        "seed": seed,
+        "victory": board.isVictory(),
+        "moves": moves,
+        "time": time.perf_counter() - start,
+    }
+
+
+def playChunk(width: int, height: int, bombs: int, seed: int, first: int, count: int, policyname: str) -> List[Dict]:
+    """
+    Plays games `first` to `first + count - 1` of a batch. Game `i` uses the seed `seed + i`.
+
+    This is the unit of work sent to each worker process.
+    """
+    movepolicy = getPolicy(policyname)
+    results = []
+    for index in range(first, first + count):
+        result = playGame(width, height, bombs, seed + index, movepolicy)
+        result["game"] = index
+        results.append(result)
+    return results
+
+
+def runBatch(width: int, height: int, bombs: int, games: int, seed: int, policyname: str = "random",
+             jobs: Optional[int] = None, chunksize: int = 1000, output=sys.stdout) -> Dict:
+    """
+    Plays `games` games across `jobs` worker processes, writing one JSON line per game to `output` as chunks finish.
+    Lines are in completion order; the `game` field gives each game's position in the batch.
+
+    Returns a summary `dict` of the batch.
+    """
+    getPolicy(policyname)  # Fail early on a bad policy name
+    start = time.perf_counter()
+    wins = 0
+    played = 0
+    jobs = jobs or os.cpu_count() or 1
+    # Only keep a few chunks in flight per worker, so huge batches don't queue millions of futures.
+    window = 4 * jobs
+    with futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunks = ((first, min(chunksize, games - first))
+                  for first in range(0, games, chunksize))
+        pending = set()
+        while True:
+            for first, count in chunks:
+                pending.add(executor.submit(playChunk, width, height,
+                                            bombs, seed, first, count, policyname))
+                if len(pending) >= window:
+                    break
+            if not pending:
+                break
+            done, pending = futures.wait(
+                pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                results = future.result()
+                output.write("".join(json.dumps(result, separators=(",", ":")) + "\n"
+                                     for result in results))
+                played += len(results)
+                wins += sum(result["victory"] for result in results)
+    elapsed = time.perf_counter() - start
+    return {
+        "games": played,
+        "wins": wins,
+        "winrate": wins / played if played else 0.0,
+        "time": elapsed,
+        "gamespersecond": played / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Play many headless minesweeper games in parallel.")
+    parser.add_argument("--width", type=int, default=9)
+    parser.add_argument("--height", type=int, default=9)
+    parser.add_argument("--bombs", type=int, default=10)
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Game i of the batch uses the seed SEED + i.")
+    parser.add_argument("--policy", default="random",
+                        help=f"One of {sorted(policies)}, or module:function.")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Worker processes (default: one per core).")
+    parser.add_argument("--chunk", type=int, default=1000,
+                        help="Games per unit of work.")
+    parser.add_argument("--output", default="-",
+                        help="JSONL file for per-game results (default: stdout).")
+    args = parser.parse_args(argv)
+
+    if args.output == "-":
+        summary = runBatch(args.width, args.height, args.bombs, args.games, args.seed,
+                           args.policy, args.jobs, args.chunk)
+    else:
+        with open(args.output, "w") as output:
+            summary = runBatch(args.width, args.height, args.bombs, args.games, args.seed,
+                               args.policy, args.jobs, args.chunk, output)
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Benchmarks for the game engine and the GUI render path.
+
+Usage:
+    python minesweeperbench.py --output bench.json
+    python minesweeperbench.py --quick --baseline bench.json
+
+Each benchmark is run for a sweep of board sizes and bomb densities, and reports throughput and p50/p99 latency.
+Results are written as JSON, and can be compared against an earlier run with `--baseline`.
+GUI benchmarks run on the current display, or under Xvfb if there is none and it is installed, and are skipped otherwise.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import minesweepergame
+
+sizes = [10, 100, 500, 1000, 2000]
+quicksizes = [10, 100, 500]
+densities = [0.01, 0.1, 0.2, 0.5]
+
+# A benchmark makes one sample: it sets up whatever it needs, then returns the seconds taken by a single operation.
+# It is given the board width, height, bomb count, and a random source.
+sample = Callable[[int, int, int, random.Random], float]
+
+
+def firstGame(width: int, height: int, bombs: int, rng: random.Random) -> minesweepergame.game:
+    """
+    Makes a game and opens its first tile, so the board is generated.
+    """
+    board = minesweepergame.game(width, height, bombs, rng.randrange(2 ** 32))
+    board.openCells(rng.randrange(board.width), rng.randrange(board.height))
+    return board
+
+
+def benchGenerate(width: int, height: int, bombs: int, rng: random.Random) -> float:
+    board = minesweepergame.game(width, height, bombs, rng.randrange(2 ** 32))
+    x = rng.randrange(board.width)
+    y = rng.randrange(board.height)
+    start = time.perf_counter()
+    board.openCells(x, y)
+    return time.perf_counter() - start
+
+
+def benchOpen(width: int, height: int, bombs: int, rng: random.Random) -> float:
+    board = firstGame(width, height, bombs, rng)
+    # Open a safe tile that isn't open yet, so the game goes on and the tile does some work.
+    candidates = [index for index in (rng.randrange(len(board.truecells)) for _ in range(64))
+                  if board.truecells[index] != -1 and board.visiblecells[index] == 0]
+    if not candidates:
+        candidates = [index for index, state in enumerate(board.visiblecells)
+                      if state == 0 and board.truecells[index] != -1] or [0]
+    index = candidates[0]
+    start = time.perf_counter()
+    board.openCells(index % board.width, index // board.width)
+    return time.perf_counter() - start
+
+
+def repeated(check: Callable[[minesweepergame.game], bool], calls: int = 1000) -> sample:
+    """
+    Times a cheap check on a generated board, averaged over `calls` calls so the timer's resolution doesn't matter.
+    """
+    def bench(width: int, height: int, bombs: int, rng: random.Random) -> float:
+        board = firstGame(width, height, bombs, rng)
+        start = time.perf_counter()
+        for _ in range(calls):
+            check(board)
+        return (time.perf_counter() - start) / calls
+    return bench
+
+
+def benchStr(width: int, height: int, bombs: int, rng: random.Random) -> float:
+    board = firstGame(width, height, bombs, rng)
+    start = time.perf_counter()
+    str(board)
+    return time.perf_counter() - start
+
+
+def benchSave(width: int, height: int, bombs: int, rng: random.Random) -> float:
+    board = firstGame(width, height, bombs, rng)
+    start = time.perf_counter()
+    board.save(io.BytesIO())
+    return time.perf_counter() - start
+
+
+def benchLoad(width: int, height: int, bombs: int, rng: random.Random) -> float:
+    data = io.BytesIO()
+    firstGame(width, height, bombs, rng).save(data)
+    data.seek(0)
+    start = time.perf_counter()
+    minesweepergame.load(data)
+    return time.perf_counter() - start
+
+
+benchmarks: Dict[str, sample] = {
+    "generate": benchGenerate,
+    "open": benchOpen,
+    "isVictory": repeated(minesweepergame.game.isVictory),
+    "isGameOver": repeated(minesweepergame.game.isGameOver),
+    "str": benchStr,
+    "save": benchSave,
+    "load": benchLoad,
+}
+
+
+def startDisplay() -> Optional[subprocess.Popen]:
+    """
+    Makes sure there is a display for the GUI benchmarks, starting Xvfb if there isn't one.
+
+    Returns the Xvfb process if one was started, which should be terminated when done.
+    Raises `RuntimeError` if there is no display and Xvfb isn't available.
+    """
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        return None
+    if shutil.which("Xvfb") is None:
+        raise RuntimeError("No display, and Xvfb is not installed.")
+    display = f":{random.randrange(100, 1000)}"
+    xvfb = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    if xvfb.poll() is not None:
+        raise RuntimeError("Xvfb failed to start.")
+    os.environ["DISPLAY"] = display
+    return xvfb
+
+
+def guiBenchmarks() -> Tuple["minesweepergui.gamegui", Dict[str, sample]]:
+    """
+    Opens a game window and gets the GUI benchmarks, which all use it.
+    The caller should close the window with `gui.top.destroy()` when done.
+    """
+    import minesweepergui
+    gui = minesweepergui.gamegui((10, 10, 10), run=False)
+    gui.top.geometry("800x800")
+
+    class click:
+        def __init__(self, x: int, y: int):
+            self.x = x
+            self.y = y
+            self.state = 0
+
+    def benchRender(width: int, height: int, bombs: int, rng: random.Random) -> float:
+        gui.boardInit(width, height, bombs)
+        gui.top.update()
+        gui.board.openCells(rng.randrange(gui.board.width),
+                            rng.randrange(gui.board.height))
+        start = time.perf_counter()
+        gui.render()
+        gui.top.update_idletasks()
+        return time.perf_counter() - start
+
+    def benchClick(width: int, height: int, bombs: int, rng: random.Random) -> float:
+        gui.boardInit(width, height, bombs)
+        gui.top.update()
+        event = click(rng.randrange(gui.canvas.winfo_width()),
+                      rng.randrange(gui.canvas.winfo_height()))
+        start = time.perf_counter()
+        gui.button1(event)
+        # The move is played on the GUI's worker thread, so wait for it to be played and drawn
+        gui.finish()
+        gui.top.update_idletasks()
+        return time.perf_counter() - start
+
+    return gui, {"gui.render": benchRender, "gui.click": benchClick}
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """
+    Gets a percentile of sorted samples, by the nearest rank.
+    """
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(name: str, bench: sample, width: int, height: int, density: float, budget: float,
+        minsamples: int = 3, maxsamples: int = 1000) -> Dict:
+    """
+    Samples a benchmark until it has used `budget` seconds or has `maxsamples` samples, but at least `minsamples`.
+    """
+    bombs = max(1, int(width * height * density))
+    rng = random.Random(f"{name}-{width}x{height}-{bombs}")
+    times: List[float] = []
+    start = time.perf_counter()
+    while len(times) < minsamples or (len(times) < maxsamples and time.perf_counter() - start < budget):
+        times.append(bench(width, height, bombs, rng))
+    ordered = sorted(times)
+    total = sum(times)
+    return {
+        "bench": name,
+        "width": width,
+        "height": height,
+        "density": density,
+        "samples": len(times),
+        "p50": percentile(ordered, 0.5),
+        "p99": percentile(ordered, 0.99),
+        "mean": total / len(times),
+        "throughput": len(times) / total if total else float("inf"),
+    }
+
+
+def compare(results: List[Dict], baseline: List[Dict], threshold: float) -> List[Dict]:
+    """
+    Pairs results with a baseline run, and prints how p50 latency changed for each.
+
+    Returns the results that got slower than `threshold` times their baseline.
+    """
+    before = {(old["bench"], old["width"], old["height"], old["density"]): old for old in baseline}
+    regressions = []
+    for new in results:
+        old = before.get((new["bench"], new["width"], new["height"], new["density"]))
+        if old is None or old["p50"] <= 0:
+            continue
+        ratio = new["p50"] / old["p50"]
+        flag = ""
+        if ratio > threshold:
+            regressions.append(new)
+            flag = "  REGRESSION"
+        print(f"{new['bench']:>12} {new['width']:>5}x{new['height']:<5} {new['density']:>5.0%}  "
+              f"p50 {old['p50'] * 1e3:10.4f} ms -> {new['p50'] * 1e3:10.4f} ms  x{ratio:.2f}{flag}", file=sys.stderr)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the minesweeper engine and GUI.")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        help=f"Board sizes to sweep (default: {sizes}).")
+    parser.add_argument("--densities", type=float, nargs="+", default=densities,
+                        help="Bomb densities to sweep, up to the cap of 0.5.")
+    parser.add_argument("--bench", nargs="+",
+                        help="Only run these benchmarks.")
+    parser.add_argument("--quick", action="store_true",
+                        help=f"Only sweep sizes {quicksizes}, with a smaller time budget.")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Seconds to spend sampling each benchmark (default: 1, or 0.2 with --quick).")
+    parser.add_argument("--no-gui", action="store_true",
+                        help="Skip the GUI benchmarks.")
+    parser.add_argument("--output", default="-",
+                        help="JSON file for the results (default: stdout).")
+    parser.add_argument("--baseline",
+                        help="JSON results of an earlier run to compare against.")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Fail if any p50 is more than this times its baseline.")
+    args = parser.parse_args(argv)
+
+    sweep = args.sizes or (quicksizes if args.quick else sizes)
+    budget = args.budget if args.budget is not None else (
+        0.2 if args.quick else 1.0)
+    selected = dict(benchmarks)
+    skipped = []
+    xvfb = None
+    gui = None
+    if not args.no_gui:
+        try:
+            xvfb = startDisplay()
+            gui, guibenchmarks = guiBenchmarks()
+            selected.update(guibenchmarks)
+        except Exception as error:  # No display, or Tk can't connect to it
+            skipped.append({"bench": "gui", "reason": str(error)})
+            print(f"Skipping GUI benchmarks: {error}", file=sys.stderr)
+    if args.bench:
+        selected = {name: bench for name,
+                    bench in selected.items() if name in args.bench}
+
+    results = []
+    try:
+        for name, bench in selected.items():
+            for size in sweep:
+                for density in args.densities:
+                    result = run(name, bench, size, size,
+                                 min(0.5, density), budget)
+                    results.append(result)
+                    print(f"{name:>12} {size:>5}x{size:<5} {density:>5.0%}  p50 {result['p50'] * 1e3:10.4f} ms  "
+                          f"p99 {result['p99'] * 1e3:10.4f} ms  {result['throughput']:12.1f}/s", file=sys.stderr)
+    finally:
+        if gui is not None:
+            gui.top.destroy()
+        if xvfb is not None:
+            xvfb.terminate()
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": minesweepergame.numpy is not None,
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    else:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(
+                results, json.load(baseline)["results"], args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks regressed.", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,74 +1,894 @@
+import math
+import mmap
+import os
 import random
-from typing import List, Set, Tuple
+import re
+import struct
+import zlib
+from array import array
+from bisect import bisect_right
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import minesweeperstats
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional and speeds up big boards (see requirements.txt).
+    numpy = None
+
+# Runs of zero tiles within a row of `game.truecells`
+zerorun = re.compile(b"\x00+")
+# The last non-zero tile before a run of zero tiles that reaches the end of a search
+runbefore = re.compile(b"[^\x00]\x00*\\Z")
+
+# Zero runs `game._floodFill` finds one at a time before it switches to labeling the whole board with NumPy
+floodruns = 4096
+
+# Saved games start with this header: magic, format version, first-click flag, width, height, bombs, seed.
+# It is followed by three bit-packed planes (mines, opened, flagged) of `ceil(width * height / 8)` bytes each.
+saveheader = struct.Struct("<4sBB2xIIIQ4x")
+savemagic = b"MSWP"
+saveversion = 1
+
+# The kinds of move in a game's journal
+journalops = ["open", "flag", "chord", "openMany", "flagMany"]
+# A journal delta ending in these bits opens a run of unopened tiles, as `(length << 30 | start) << 4 | openrun`.
+# Boards of more than `runtiles` tiles, where those might not fit, journal every tile instead.
+openrun = 15
+runtiles = 1 << 29
+# Bytes of random keys `generate` draws at a time. A multiple of 4, so the blocks join into the same keys as one draw.
+keyblock = 1 << 20
+
+
+@minesweeperstats.timed("game.generate")
+def generate(width: int, height: int, bombs: int, x: int, y: int, rng: random.Random) -> array:
+    """
+    Generates the true board for a game whose first opened tile is (`x`, `y`).
+
+    Bombs are the tiles with the smallest of a single batch of random keys drawn for every tile outside the
+    3x3 area around the first tile, so the result depends only on the arguments and the state of `rng`,
+    whether or not NumPy is available.
+
+    Returns the tiles as a flat row-major `array` of neighbor counts, with -1 for bombs.
+    """
+    # Flat indices of the tiles that must be clear, in ascending order
+    excluded = [ey * width + ex for ey in range(max(0, y - 1), min(height, y + 2))
+                for ex in range(max(0, x - 1), min(width, x + 2))]
+    allowed = width * height - len(excluded)
+    bombs = min(bombs, allowed)
+    # Allowed tile `p` (counting only allowed tiles) is the tile at index `p + bisect_right(skips, p)`.
+    skips = [e - i for i, e in enumerate(excluded)]
+    # Keys are drawn a block at a time, since a single huge draw holds the GIL long enough to stall other threads
+    keys = b"".join(rng.randbytes(min(keyblock, 4 * allowed - start))
+                    for start in range(0, 4 * allowed, keyblock))
+    # The bomb plane is padded by one tile on every side, so neighbors never wrap around a row.
+    paddedwidth = width + 2
+    if numpy is not None:
+        # Take the smallest keys, breaking ties by position
+        keyarray = numpy.frombuffer(keys, dtype=numpy.uint32)
+        threshold = numpy.partition(keyarray, bombs - 1)[bombs - 1]
+        below = numpy.flatnonzero(keyarray < threshold)
+        ties = numpy.flatnonzero(keyarray == threshold)[:bombs - len(below)]
+        bombindices = numpy.concatenate((below, ties))
+        bombindices += numpy.searchsorted(skips, bombindices, side="right")
+        padded = numpy.zeros((height + 2, paddedwidth), dtype=numpy.uint8)
+        padded[bombindices // width + 1, bombindices % width + 1] = 1
+        plane = padded.tobytes()
+    else:
+        keyarray = array("I")
+        keyarray.frombytes(keys)
+        # Only keys below a generous estimate of the threshold need to be sorted
+        limit = (bombs + 8 * math.isqrt(bombs) + 16) * 2 ** 32 // allowed
+        candidates = [p for p, key in enumerate(keyarray) if key < limit]
+        if len(candidates) < bombs:
+            candidates = range(allowed)
+        picks = sorted(candidates, key=keyarray.__getitem__)[:bombs]
+        plane = bytearray(paddedwidth * (height + 2))
+        for p in picks:
+            index = p + bisect_right(skips, p)
+            plane[(index // width + 1) * paddedwidth + index % width + 1] = 1
+
+    return countNeighbors(bytes(plane), width, height)
+
+
+def countNeighbors(plane: bytes, width: int, height: int) -> array:
+    """
+    Counts the bombs around every tile of a bomb plane, which has a byte per tile (1 for bombs)
+    and is padded by one empty tile on every side.
+
+    Returns the tiles as a flat row-major `array` of neighbor counts, with -1 for bombs.
+    """
+    paddedwidth = width + 2
+    # Neighbor counts are the sum of the 8 shifted copies of the bomb plane.
+    # Treating the plane as one integer with a byte per tile does this in a few passes, since no sum can carry.
+    isbomb = int.from_bytes(plane, "little")
+    counts = 0
+    for offset in (1, paddedwidth - 1, paddedwidth, paddedwidth + 1):
+        counts += (isbomb >> (8 * offset)) + (isbomb << (8 * offset))
+    # Bombs become 0xFF, which is -1 as a signed byte.
+    counts = (counts | isbomb * 0xFF) & ((1 << (8 * len(plane))) - 1)
+    padded = counts.to_bytes(len(plane), "little")
+    truecells = array("b")
+    for row in range(1, height + 1):
+        truecells.frombytes(
+            padded[row * paddedwidth + 1:row * paddedwidth + 1 + width])
+    return truecells
+
+
+def packBits(mask: bytes) -> bytes:
+    """
+    Packs a byte per tile (each 0 or 1) into a bit per tile, with tile `i` in bit `i % 8` of byte `i // 8`.
+    """
+    if numpy is not None:
+        return numpy.packbits(numpy.frombuffer(mask, dtype=numpy.uint8), bitorder="little").tobytes()
+    size = -(-len(mask) // 8)
+    bits = int.from_bytes(mask, "little")
+    # Fold neighboring bytes together, doubling the bits gathered in each group, until every 8th byte holds 8 tiles.
+    for shift, pattern in ((7, b"\x03\x00"), (14, b"\x0f\x00\x00\x00"), (28, b"\xff" + bytes(7))):
+        bits = (bits | (bits >> shift)) & int.from_bytes(
+            pattern * (size * 8 // len(pattern)), "little")
+    return bits.to_bytes(size * 8, "little")[::8]
+
+
+def openRuns(indices: array) -> array:
+    """
+    Makes the journal deltas for opening the unopened tiles at `indices`, as runs of consecutive indices.
+    """
+    deltas = array("q")
+    if numpy is not None and len(indices) > 64:
+        # A chunk at a time, since huge openings have many more tiles than runs. Runs split between chunks still work.
+        chunksize = 1 << 20
+        for chunk in range(0, len(indices), chunksize):
+            flat = numpy.frombuffer(indices, dtype=numpy.int32)[
+                chunk:chunk + chunksize].astype(numpy.int64)
+            breaks = numpy.flatnonzero(numpy.diff(flat) != 1) + 1
+            starts = flat[numpy.concatenate(([0], breaks))]
+            lengths = numpy.diff(numpy.concatenate(([0], breaks, [len(flat)])))
+            deltas.frombytes(((lengths << 30 | starts) << 4 | openrun).tobytes())
+        return deltas
+    start = end = -1
+    for index in indices:
+        if index != end:
+            if end > start:
+                deltas.append((end - start << 30 | start) << 4 | openrun)
+            start = index
+        end = index + 1
+    if end > start:
+        deltas.append((end - start << 30 | start) << 4 | openrun)
+    return deltas
+
+
+# Each byte of a bit-packed plane as 8 bytes of 0 or 1
+unpacked = [bytes((byte >> bit) & 1 for bit in range(8)) for byte in range(256)]
+
+
+def unpackBits(packed: bytes, count: int) -> bytes:
+    """
+    Unpacks the first `count` tiles of a bit-packed plane from `packBits` into a byte per tile.
+    """
+    if numpy is not None:
+        return numpy.unpackbits(numpy.frombuffer(packed, dtype=numpy.uint8), count=count, bitorder="little").tobytes()
+    return b"".join(map(unpacked.__getitem__, packed))[:count]
+
+
+def load(file: Union[str, os.PathLike, BinaryIO]) -> "game":
+    """
+    Loads a game saved with `game.save`.
+
+    To read a large saved board without loading all of it, use `savedgame` instead.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            data = f.read()
+    else:
+        data = file.read()
+    return savedgame(data).toGame()
+
+
+class columnview:
+    def __init__(self, cells: array, width: int, height: int, x: int):
+        """
+        A read-only view of one column of a flat row-major board.
+        """
+        self.cells = cells
+        self.width = width
+        self.height = height
+        self.x = x
+
+    def __getitem__(self, y: int) -> int:
+        if y < 0 or self.height <= y:
+            raise IndexError(
+                f"Row {y} is invalid for a grid of height {self.height}.")
+        return self.cells[y * self.width + self.x]
+
+    def __len__(self) -> int:
+        return self.height
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.cells[self.x::self.width])
+
+
+class boardview:
+    def __init__(self, cells: array, width: int, height: int):
+        """
+        A read-only view of a flat row-major board, indexed as `view[x][y]` like a `List[List[int]]`.
+        """
+        self.cells = cells
+        self.width = width
+        self.height = height
+
+    def __getitem__(self, x: int) -> columnview:
+        if x < 0 or self.width <= x:
+            raise IndexError(
+                f"Column {x} is invalid for a grid of width {self.width}.")
+        return columnview(self.cells, self.width, self.height, x)
+
+    def __len__(self) -> int:
+        return self.width
+
+    def __iter__(self) -> Iterator[columnview]:
+        return (columnview(self.cells, self.width, self.height, x) for x in range(self.width))
 
 
 class game:
-    def __init__(self, width: int, height: int, bombs: int):
+    def __init__(self, width: int, height: int, bombs: int, seed: Optional[int] = None):
+        """
+        Create a new game. The board is generated when the first tile is opened.
+
+        `seed` makes the generated board reproducible; if `None`, a random seed is chosen and kept in `self.seed`.
+        """
         self.width = max(4, width)  # At least width of 4
         self.height = max(4, height)  # At least height of 4
         # At most, half the squares. At least, 1
         self.numbombs = min(int(self.width * self.height / 2), max(1, bombs))
-        self.truemap: List[List[int]] = [
-            [0 for y in range(height)] for x in range(width)]
-        self.visible: List[List[int]] = [
-            [0 for y in range(height)] for x in range(width)]
+        # Tiles are stored flat in row-major order, so tile (x, y) is at index `y * width + x`.
+        # `truecells` holds neighbor counts or -1 for bombs.
+        # `visiblecells` holds 0 for unopened, 1 for opened, or -1 for flagged tiles.
+        self.truecells = array("b", (0,)) * (self.width * self.height)
+        self.visiblecells = array("b", (0,)) * (self.width * self.height)
         self.first = True
+        self.generatedonopen = False  # Whether the first move generated the board, so seeking before it ungenerates it
+        self.seed: int = random.randrange(2 ** 32) if seed is None else seed
+        # Running counters so the game state can be checked without scanning the board.
+        self.numopened = 0  # Opened non-bomb tiles
+        self.numcorrectflags = 0  # Flags placed on bombs
+        self.numwrongflags = 0  # Flags placed on non-bomb tiles
+        self.detonated = False  # Whether a bomb has been opened
+        # Journal of the moves made, so they can be undone and replayed (see `seek`).
+        # Each move is `index << 3 | op` with op indexing `journalops`, and ends at `journalends` in `journaldeltas`.
+        # Each delta is a tile the move changed, as `index << 4 | (old + 1) << 2 | (new + 1)` of its visibility state,
+        # or a run of tiles it opened (see `openrun`).
+        self.journalmoves = array("q")
+        self.journalends = array("q")
+        self.journaldeltas = array("q")
+        self.cursor = 0  # How many moves of the journal are applied
+        # Compressed copies of `visiblecells` and the counters at some moves, so seeking doesn't replay from the start
+        self.snapshotmoves = array("q")
+        self.snapshots: List[Tuple[bytes, Tuple[int, int, int, bool]]] = []
+        self.clearedflags = array("i")  # Flagged tiles opened by the current move
+
+    @property
+    def truemap(self) -> boardview:
+        """
+        A read-only `[x][y]` view of the true board. Prefer `truecells` for bulk access.
+        """
+        return boardview(self.truecells, self.width, self.height)
+
+    @property
+    def visible(self) -> boardview:
+        """
+        A read-only `[x][y]` view of the visibility states. Prefer `visiblecells` for bulk access.
+        """
+        return boardview(self.visiblecells, self.width, self.height)
 
     def open(self, x: int, y: int) -> Set[Tuple[int, int]]:
         """
         Open a tile. This will generate the grid if it is the first tile opened.
 
         Returns a `set` of the locations revealed, or `None` if it was a bomb.
+
+        This is a convenience wrapper around `openCells`, which should be preferred when many tiles may be revealed.
+        """
+        revealed = self.openCells(x, y)
+        if revealed is None:
+            return None
+        return {(i % self.width, i // self.width) for i in revealed}
+
+    def adopt(self, truecells: array):
+        """
+        Uses an already generated board, such as one from `generate`, instead of generating one on the first open.
+
+        `truecells` is a flat row-major `array` of neighbor counts, with -1 for bombs.
+        """
+        if not self.first:
+            raise RuntimeError("The board has already been generated.")
+        if len(truecells) != self.width * self.height:
+            raise ValueError(
+                f"Board of {len(truecells)} tiles can't be used for a grid of size ({self.width}, {self.height}).")
+        self.truecells[:] = truecells
+        # Bombs are -1, which is 0xFF as a byte; counting bytes is much quicker than counting array items.
+        self.numbombs = self.truecells.tobytes().count(0xFF)
+        self.first = False
+
+    @minesweeperstats.timed("game.openCells")
+    def openCells(self, x: int, y: int) -> Optional[array]:
+        """
+        Open a tile. This will generate the grid if it is the first tile opened.
+
+        Returns an `array` of the revealed locations as flat indices (`y * width + x`), or `None` if it was a bomb.
         """
         if x < 0 or self.width <= x or y < 0 or self.height <= y:  # Ensure we are within the grid.
             raise IndexError(
                 f"Tile ({x}, {y}) is invalid for a grid of size ({self.width}, {self.height}).")
         if self.first:
             # On the first one, we generate the map so this tile must be clear.
-            bombstoplant = self.numbombs
-            while bombstoplant > 0:
-                rx = random.randint(0, self.width - 1)
-                ry = random.randint(0, self.height - 1)
-                if abs(rx - x) <= 1 and abs(ry - y) <= 1:
-                    continue  # Don't plant a bomb on this first tile or the neighboring ones
-                elif self.truemap[rx][ry] == -1:
-                    continue  # There's already a bomb on this tile
-                else:
-                    # Set the tile to be the bomb
-                    self.truemap[rx][ry] = -1
-                    # Increment the neighboring tiles' neighbor count
-                    for dx in (rx - 1, rx, rx + 1):
-                        if 0 <= dx and dx < self.width:  # Ensure we're not over the edge for x
-                            for dy in (ry - 1, ry, ry + 1):
-                                if 0 <= dy and dy < self.height:  # Ensure we're not over the edge for y
-                                    # Ensure this isn't a bomb tile
-                                    if self.truemap[dx][dy] >= 0:
-                                        self.truemap[dx][dy] += 1
-                    bombstoplant -= 1
-            self.first = False
+            # Very small boards may not fit every bomb outside the first tile's neighbors, so `adopt` recounts them.
+            self.adopt(generate(self.width, self.height, self.numbombs,
+                                x, y, random.Random(self.seed)))
+            self.generatedonopen = True
         elif self.isGameOver() or self.isVictory():
-            return []
+            return array("i")
         # Now we do the normal stuff of checking the tile
-        tile = self.truemap[x][y]
-        self.visible[x][y] = 1
-        if tile == -1:
-            # You just stepped on a bomb.
-            return None
-        elif tile == 0:
-            # We can recursively open all neighbors since they must be safe.
-            locations: Set[Tuple[int, int]] = set([(x, y)])
-            for dx in (x - 1, x, x + 1):
-                if 0 <= dx and dx < self.width:  # Ensure we're not over the edge for x
-                    for dy in (y - 1, y, y + 1):
-                        if 0 <= dy and dy < self.height:  # Ensure we're not over the edge for y
-                            # Ensure the tile is not already opened (otherwise infinite recursion)
-                            if self.visible[dx][dy] != 1:
-                                locations.update(self.open(dx, dy))
-            return locations
+        index = y * self.width + x
+        tile = self.truecells[index]
+        # Opening an opened tile changes nothing, so it isn't journaled.
+        journaled = self.visiblecells[index] != 1
+        if journaled and not self.snapshots:
+            self._snapshot()
+        if tile == 0:
+            revealed = self._floodFill(x, y)
         else:
-            # Just a tile.
-            return set([(x, y)])
+            self._reveal(index)
+            # You just stepped on a bomb if it's -1.
+            revealed = None if tile == -1 else array("i", (index,))
+        if journaled:
+            self._journalOpen(
+                index << 3, array("i", (index,)) if revealed is None else revealed)
+            minesweeperstats.count(
+                "game.revealed", 1 if revealed is None else len(revealed))
+        return revealed
+
+    def _checkedIndices(self, cells: Iterable[Tuple[int, int]]) -> array:
+        """
+        Converts tiles to flat indices, checking them all before anything is changed.
+        """
+        indices = array("i")
+        for x, y in cells:
+            if x < 0 or self.width <= x or y < 0 or self.height <= y:  # Ensure we are within the grid.
+                raise IndexError(
+                    f"Tile ({x}, {y}) is invalid for a grid of size ({self.width}, {self.height}).")
+            indices.append(y * self.width + x)
+        return indices
+
+    @minesweeperstats.timed("game.openMany")
+    def openMany(self, cells: Iterable[Tuple[int, int]]) -> array:
+        """
+        Opens many tiles as a single move, which is journaled and undone as one.
+        This will generate the grid around the first tile if no tile has been opened yet.
 
+        Tiles are opened in order, stopping at a bomb. Returns an `array` of every revealed location as flat indices
+        (`y * width + x`), including the bomb if one was opened, so check `isGameOver` afterward.
+        """
+        indices = self._checkedIndices(cells)
+        if len(indices) == 0:
+            return array("i")
+        return self._openIndices(indices, indices[0] << 3 | 3)
+
+    @minesweeperstats.timed("game.chord")
+    def chord(self, x: int, y: int) -> array:
+        """
+        Opens every unopened, unflagged neighbor of an opened number tile that has as many flags around it as its number.
+
+        Returns an `array` of the revealed locations as flat indices, which is empty if the tile isn't satisfied.
+        If a flag was wrong, this opens a bomb, which is included, so check `isGameOver` afterward.
+        """
+        if x < 0 or self.width <= x or y < 0 or self.height <= y:  # Ensure we are within the grid.
+            raise IndexError(
+                f"Tile ({x}, {y}) is invalid for a grid of size ({self.width}, {self.height}).")
+        index = y * self.width + x
+        tile = self.truecells[index]
+        if self.first or self.visiblecells[index] != 1 or tile <= 0:
+            return array("i")
+        neighbors = [ny * self.width + nx for ny in range(max(0, y - 1), min(self.height, y + 2))
+                     for nx in range(max(0, x - 1), min(self.width, x + 2))]
+        visiblecells = self.visiblecells
+        if sum(visiblecells[i] == -1 for i in neighbors) != tile:
+            return array("i")
+        return self._openIndices(array("i", [i for i in neighbors if visiblecells[i] == 0]), index << 3 | 2)
+
+    def _openIndices(self, indices: array, move: int) -> array:
+        """
+        Opens tiles by flat index in order until a bomb, journaling them as the single `move`.
+        """
+        width = self.width
+        if self.first:
+            first = indices[0]
+            self.adopt(generate(width, self.height, self.numbombs,
+                                first % width, first // width, random.Random(self.seed)))
+            self.generatedonopen = True
+        elif self.isGameOver() or self.isVictory():
+            return array("i")
+        if not self.snapshots:
+            self._snapshot()
+        truecells = self.truecells
+        visiblecells = self.visiblecells
+        revealed = array("i")
+        # The loop stops at a bomb, so this is won once every tile without a correct flag is opened, with no wrong flags
+        goal = self.width * self.height - self.numcorrectflags
+        for index in indices:
+            if visiblecells[index] == 1:
+                continue
+            # Once won, only flagged bombs are left unopened, and those shouldn't be opened.
+            if self.numopened == goal and self.numwrongflags == 0:
+                break
+            tile = truecells[index]
+            if tile == 0:
+                revealed.extend(self._floodFill(index % width, index // width))
+            else:
+                self._reveal(index)
+                revealed.append(index)
+                if tile == -1:
+                    break
+        if len(revealed) > 0:
+            self._journalOpen(move, revealed)
+        return revealed
+
+    @minesweeperstats.timed("game.flagMany")
+    def flagMany(self, cells: Iterable[Tuple[int, int]]) -> array:
+        """
+        Places or removes flags on many tiles as a single move, which is journaled and undone as one.
+
+        Returns an `array` of the changed locations as flat indices. Opened tiles are left alone, a tile given twice is
+        toggled twice, and nothing is changed if the game has not started or has ended.
+        """
+        indices = self._checkedIndices(cells)
+        if len(indices) == 0 or self.first or self.isGameOver() or self.isVictory():
+            return array("i")
+        if not self.snapshots:
+            self._snapshot()
+        truecells = self.truecells
+        visiblecells = self.visiblecells
+        changed = array("i")
+        deltas = array("q")
+        for index in indices:
+            state = visiblecells[index]
+            if state == 1:
+                continue
+            bomb = truecells[index] == -1
+            if state == 0:  # Place flag
+                visiblecells[index] = -1
+                deltas.append(index << 4 | 1 << 2 | 0)
+                if bomb:
+                    self.numcorrectflags += 1
+                else:
+                    self.numwrongflags += 1
+            else:  # Remove flag
+                visiblecells[index] = 0
+                deltas.append(index << 4 | 0 << 2 | 1)
+                if bomb:
+                    self.numcorrectflags -= 1
+                else:
+                    self.numwrongflags -= 1
+            changed.append(index)
+        if len(changed) > 0:
+            self._journal(indices[0] << 3 | 4, deltas)
+        return changed
+
+    def _journalOpen(self, move: int, revealed: array):
+        """
+        Journals a move that opened the tiles `revealed`.
+
+        Tiles that were unopened are journaled as runs, so a big opening takes a few deltas per row rather than one per
+        tile. Cleared flags and a bomb change other counters, so they get a delta each.
+        """
+        cleared = set(self.clearedflags)
+        del self.clearedflags[:]
+        deltas = array("q", [i << 4 | 2 for i in cleared])
+        # A bomb can only be the last tile opened
+        if self.truecells[revealed[-1]] == -1:
+            if revealed[-1] not in cleared:
+                deltas.append(revealed[-1] << 4 | 6)
+            revealed = revealed[:-1]
+        if cleared:
+            revealed = array("i", [i for i in revealed if i not in cleared])
+        if self.width * self.height > runtiles:
+            deltas.extend([i << 4 | 6 for i in revealed])
+        else:
+            deltas.extend(openRuns(revealed))
+        self._journal(move, deltas)
+
+    def _journal(self, move: int, deltas: array):
+        """
+        Appends a move and the deltas it made to the journal, dropping any undone moves after the cursor.
+        """
+        if self.cursor < len(self.journalmoves):
+            del self.journaldeltas[self.journalends[self.cursor - 1] if self.cursor else 0:]
+            del self.journalmoves[self.cursor:]
+            del self.journalends[self.cursor:]
+            kept = bisect_right(self.snapshotmoves, self.cursor)
+            del self.snapshotmoves[kept:]
+            del self.snapshots[kept:]
+        self.journalmoves.append(move)
+        self.journaldeltas.extend(deltas)
+        self.journalends.append(len(self.journaldeltas))
+        self.cursor += 1
+        # Snapshot often enough that seeking never replays much more than it costs to restore a snapshot.
+        last = self.snapshotmoves[-1]
+        since = len(self.journaldeltas) - (self.journalends[last - 1] if last else 0)
+        if self.cursor - last >= 1000 or 64 * since >= self.width * self.height:
+            self._snapshot()
+
+    def _snapshot(self):
+        """
+        Saves the visibility states and counters at the cursor.
+        """
+        self.snapshotmoves.append(self.cursor)
+        self.snapshots.append((zlib.compress(self.visiblecells.tobytes(), 1),
+                               (self.numopened, self.numcorrectflags, self.numwrongflags, self.detonated)))
+
+    @property
+    def moves(self) -> int:
+        """
+        The number of moves in the journal, including undone moves that can be redone.
+        """
+        return len(self.journalmoves)
+
+    def history(self) -> Iterator[Tuple[str, int, int]]:
+        """
+        The moves in the journal, as (kind, x, y) with the kind from `journalops`.
+        Batches of tiles are given by their first tile.
+        """
+        for move in self.journalmoves:
+            index = move >> 3
+            yield (journalops[move & 7], index % self.width, index // self.width)
+
+    @minesweeperstats.timed("game.seek")
+    def seek(self, move: int):
+        """
+        Puts the board in the state it was in after the first `move` moves of the journal.
+
+        This either replays the journal from the current state, or restores the nearest earlier snapshot and
+        replays from there, whichever touches fewer tiles. The board itself stays as it was generated,
+        but seeking back to before the move that generated it makes the next open the first one again.
+        New moves made after seeking back replace the moves after it.
+        """
+        if move < 0 or len(self.journalmoves) < move:
+            raise IndexError(
+                f"Move {move} is invalid for a journal of {len(self.journalmoves)} moves.")
+        if move == self.cursor:
+            return
+        ends = self.journalends
+
+        def offset(at: int) -> int:
+            return ends[at - 1] if at else 0
+        snapshot = bisect_right(self.snapshotmoves, move) - 1
+        # Restoring costs a board's worth of work, but it is done in C, so it is weighted lightly.
+        restorecost = self.width * self.height // 64 + \
+            offset(move) - offset(self.snapshotmoves[snapshot])
+        if abs(offset(move) - offset(self.cursor)) > restorecost:
+            data, counters = self.snapshots[snapshot]
+            self.visiblecells[:] = array("b", zlib.decompress(data))
+            self.numopened, self.numcorrectflags, self.numwrongflags, self.detonated = counters
+            self.cursor = self.snapshotmoves[snapshot]
+        if move > self.cursor:
+            self._replay(offset(self.cursor), offset(move), True)
+        else:
+            self._replay(offset(move), offset(self.cursor), False)
+        self.cursor = move
+        # Opening first tiles elsewhere generates the same board with that tile clear, as a new game would
+        self.first = self.generatedonopen and move == 0
+
+    def _replay(self, start: int, end: int, forward: bool):
+        """
+        Applies the journal deltas from `start` to `end`, or undoes them in reverse if not `forward`.
+        """
+        truecells = self.truecells
+        visiblecells = self.visiblecells
+        deltas = self.journaldeltas[start:end]
+        if not forward:
+            deltas.reverse()
+        runstate = array("b", (1 if forward else 0,))
+        for delta in deltas:
+            if delta & 15 == openrun:
+                index = delta >> 4 & (1 << 30) - 1
+                length = delta >> 34
+                visiblecells[index:index + length] = runstate * length
+                self.numopened += length if forward else -length
+                continue
+            index = delta >> 4
+            old = ((delta >> 2) & 3) - 1
+            new = (delta & 3) - 1
+            if not forward:
+                old, new = new, old
+            visiblecells[index] = new
+            bomb = truecells[index] == -1
+            if old == 1:
+                if bomb:
+                    self.detonated = False
+                else:
+                    self.numopened -= 1
+            elif old == -1:
+                if bomb:
+                    self.numcorrectflags -= 1
+                else:
+                    self.numwrongflags -= 1
+            if new == 1:
+                if bomb:
+                    self.detonated = True
+                else:
+                    self.numopened += 1
+            elif new == -1:
+                if bomb:
+                    self.numcorrectflags += 1
+                else:
+                    self.numwrongflags += 1
+
+    def undo(self) -> bool:
+        """
+        Undoes the last move. Returns `False` if there was nothing to undo.
+        """
+        if self.cursor == 0:
+            return False
+        self.seek(self.cursor - 1)
+        return True
+
+    def redo(self) -> bool:
+        """
+        Redoes the last undone move. Returns `False` if there was nothing to redo.
+        """
+        if self.cursor == len(self.journalmoves):
+            return False
+        self.seek(self.cursor + 1)
+        return True
+
+    def rewind(self):
+        """
+        Undoes every move, back to the start of the journal.
+        """
+        self.seek(0)
+
+    def _floodFill(self, x: int, y: int) -> array:
+        """
+        Opens the region of zero tiles containing (`x`, `y`) and its border.
+
+        The region is found as runs of zero tiles within rows, so most of the work is per run rather than per tile.
+        Rows are only searched around the runs next to them, so the work doesn't grow with the width of the board.
+        Tiles next to a zero tile can never be bombs.
+        """
+        width = self.width
+        height = self.height
+        truecells = self.truecells
+        visiblecells = self.visiblecells
+
+        def runStart(index: int, rowstart: int) -> int:
+            # The zero run ending at `index` reaches back past a chunk only if the chunk has no non-zero tile
+            chunk = 64
+            while True:
+                low = max(rowstart, index - chunk)
+                match = runbefore.search(truecells, low, index + 1)
+                if match is not None:
+                    return match.start() + 1
+                if low == rowstart:
+                    return rowstart
+                chunk *= 4
+
+        # Find the connected runs of zero tiles, as (start, end) columns per row, with `end` exclusive
+        start = y * width + x
+        end = zerorun.match(truecells, start, (y + 1) * width).end()
+        start = runStart(start, y * width)
+        region: Dict[int, List[Tuple[int, int]]] = {
+            y: [(start - y * width, end - y * width)]}
+        # Runs are told apart by their flat end
+        seen: Set[int] = {end}
+        pending: List[Tuple[int, int, int]] = [(y, start, end)]
+        while pending:
+            row, start, end = pending.pop()
+            for nextrow in (row - 1, row + 1):
+                if 0 <= nextrow and nextrow < height:  # Ensure we're not over the edge for y
+                    rowstart = nextrow * width
+                    rowend = rowstart + width
+                    # Runs overlapping [start - 1, end + 1) are diagonally or directly adjacent
+                    low = max(rowstart, start - 1 + (nextrow - row) * width)
+                    high = min(rowend, end + 1 + (nextrow - row) * width)
+                    for match in zerorun.finditer(truecells, low, high):
+                        runend = match.end()
+                        if runend == high and high < rowend:
+                            runend = zerorun.match(truecells, match.start(), rowend).end()
+                        if runend in seen:
+                            continue
+                        seen.add(runend)
+                        # Past a point, labeling every run of the board at once is faster than going run by run
+                        if numpy is not None and len(seen) > floodruns:
+                            return self._floodFillArrays(x, y)
+                        runstart = match.start()
+                        if runstart == low and low > rowstart:
+                            runstart = runStart(runstart, rowstart)
+                        if nextrow in region:
+                            region[nextrow].append(
+                                (runstart - rowstart, runend - rowstart))
+                        else:
+                            region[nextrow] = [
+                                (runstart - rowstart, runend - rowstart)]
+                        pending.append((nextrow, runstart, runend))
+
+        # Each run opens itself and its border, so widen the runs by one tile on each side
+        widened: Dict[int, List[Tuple[int, int]]] = {}
+        for row, runs in region.items():
+            widened[row] = [(start - 1 if start > 0 else 0,
+                             end + 1 if end < width else width) for start, end in runs]
+        spanrows: Set[int] = set()
+        for row in widened:
+            spanrows.update((row - 1, row, row + 1))
+        spanrows.discard(-1)
+        spanrows.discard(height)
+
+        # Open the widened runs of each row and its neighbors, merging them so every tile is checked once
+        nospans: List[Tuple[int, int]] = []
+        revealed = array("i")
+        opened = 0
+        unflagged = 0
+        for row in spanrows:
+            rowspans = widened.get(row - 1, nospans) + widened.get(row, nospans) + \
+                widened.get(row + 1, nospans)
+            rowspans.sort()
+            # A sentinel span past the end of the row flushes the last merged span
+            rowspans.append((width + 1, width + 1))
+            mergedstart, mergedend = rowspans[0]
+            for start, end in rowspans:
+                if start <= mergedend:
+                    if end > mergedend:
+                        mergedend = end
+                    continue
+                # Open the merged span [mergedstart, mergedend)
+                low = row * width + mergedstart
+                high = row * width + mergedend
+                segment = visiblecells[low:high]
+                unopened = segment.count(0)
+                flagged = segment.count(-1)
+                if flagged > 0:
+                    self.clearedflags.extend([i for i, state in enumerate(
+                        segment, low) if state == -1])
+                if unopened + flagged == high - low:
+                    revealed.extend(range(low, high))
+                elif unopened + flagged > 0:
+                    revealed.extend([i for i, state in enumerate(
+                        segment, low) if state != 1])
+                opened += unopened + flagged
+                unflagged += flagged
+                visiblecells[low:high] = array("b", (1,)) * (high - low)
+                mergedstart, mergedend = start, end
+        self.numopened += opened
+        # Opening a flagged tile removes the flag
+        self.numwrongflags -= unflagged
+        # Reopening an opened zero tile changes nothing, but the tile itself is still reported.
+        if len(revealed) == 0:
+            revealed.append(y * width + x)
+        return revealed
+
+    def _floodFillArrays(self, x: int, y: int) -> array:
+        """
+        Opens the region of zero tiles containing (`x`, `y`) and its border with NumPy, for regions too big to find a
+        run at a time.
+
+        Every zero run of the board is labeled with its region, by joining the runs that touch in neighboring rows
+        until no more can be joined.
+        """
+        width = self.width
+        height = self.height
+        zero = numpy.frombuffer(self.truecells, dtype=numpy.int8).reshape(
+            height, width) == 0
+        # Index arrays are built a band of rows at a time as 32-bit integers, since huge boards have tens of millions
+        # of runs.
+        band = max(1, (1 << 22) // width)
+        # Flat indices of the first and last tile of every zero run, in order
+        firsts = []
+        lasts = []
+        for top in range(0, height, band):
+            rows = zero[top:top + band]
+            edges = rows.copy()
+            edges[:, 1:] &= ~rows[:, :-1]
+            firsts.append((numpy.flatnonzero(edges) + top * width).astype(numpy.int32))
+            edges = rows.copy()
+            edges[:, :-1] &= ~rows[:, 1:]
+            lasts.append((numpy.flatnonzero(edges) + top * width).astype(numpy.int32))
+        firsts = numpy.concatenate(firsts)
+        lasts = numpy.concatenate(lasts)
+        # Runs touching in neighboring rows, as (upper, lower) run pairs, taken where each stretch of touching tiles
+        # starts since the rest of the stretch joins the same runs.
+        uppers = []
+        lowers = []
+        for top in range(0, height - 1, band):
+            upper = zero[top:top + band]
+            lower = zero[top + 1:top + band + 1]
+            upper = upper[:len(lower)]
+            for touching, upperoffset, loweroffset in ((upper & lower, 0, 0),
+                                                       (upper[:, :-1] & lower[:, 1:], 0, 1),
+                                                       (upper[:, 1:] & lower[:, :-1], 1, 0)):
+                touching[:, 1:] &= ~touching[:, :-1]
+                rows, columns = numpy.nonzero(touching)
+                flat = (rows + top) * width + columns
+                uppers.append((numpy.searchsorted(
+                    firsts, flat + upperoffset, side="right") - 1).astype(numpy.int32))
+                lowers.append((numpy.searchsorted(
+                    firsts, flat + width + loweroffset, side="right") - 1).astype(numpy.int32))
+        uppers = numpy.concatenate(uppers)
+        lowers = numpy.concatenate(lowers)
+        del zero
+        # Join regions by pointing the larger root of each pair at the smaller one, then every run straight at its
+        # root, so the number of rounds grows only with the log of the region size.
+        roots = numpy.arange(len(firsts), dtype=numpy.int32)
+        while True:
+            upperroots = roots[uppers]
+            lowerroots = roots[lowers]
+            apart = upperroots != lowerroots
+            if not apart.any():
+                break
+            uppers = uppers[apart]
+            lowers = lowers[apart]
+            numpy.minimum.at(roots, numpy.maximum(upperroots[apart], lowerroots[apart]),
+                             numpy.minimum(upperroots[apart], lowerroots[apart]))
+            while True:
+                jumped = roots[roots]
+                if numpy.array_equal(jumped, roots):
+                    break
+                roots = jumped
+        del uppers, lowers, upperroots, lowerroots, apart
+        # Mark the region's runs, then widen it by one tile in every direction to get its border
+        runs = numpy.flatnonzero(
+            roots == roots[numpy.searchsorted(firsts, y * width + x, side="right") - 1])
+        marks = numpy.zeros(width * height + 1, dtype=numpy.int8)
+        marks[firsts[runs]] = 1
+        marks[lasts[runs] + 1] -= 1
+        del firsts, lasts, roots, runs
+        region = numpy.cumsum(marks, dtype=numpy.int8, out=marks)[:-1].view(
+            numpy.bool_).reshape(height, width)
+        rows = region.copy()
+        rows[:, 1:] |= region[:, :-1]
+        rows[:, :-1] |= region[:, 1:]
+        del region, marks
+        opening = rows.copy()
+        opening[1:] |= rows[:-1]
+        opening[:-1] |= rows[1:]
+        del rows
+
+        visible = numpy.frombuffer(self.visiblecells, dtype=numpy.int8).reshape(
+            height, width)
+        revealed = array("i")
+        flagged = []
+        for top in range(0, height, band):
+            states = numpy.where(opening[top:top + band], visible[top:top + band], 1)
+            revealed.frombytes((numpy.flatnonzero(states != 1) + top * width).astype(numpy.int32).tobytes())
+            flagged.extend((numpy.flatnonzero(states == -1) + top * width).tolist())
+        # Opening a flagged tile removes the flag
+        self.clearedflags.extend(flagged)
+        visible[opening] = 1
+        self.numopened += len(revealed)
+        self.numwrongflags -= len(flagged)
+        # Reopening an opened zero tile changes nothing, but the tile itself is still reported.
+        if len(revealed) == 0:
+            revealed.append(y * width + x)
+        return revealed
+
+    def _reveal(self, index: int):
+        """
+        Marks a single tile as opened and updates the game state counters.
+        """
+        tile = self.truecells[index]
+        state = self.visiblecells[index]
+        if state != 1:
+            if state == -1:  # Opening a flagged tile removes the flag
+                self.clearedflags.append(index)
+                if tile == -1:
+                    self.numcorrectflags -= 1
+                else:
+                    self.numwrongflags -= 1
+            if tile == -1:
+                self.detonated = True
+            else:
+                self.numopened += 1
+        self.visiblecells[index] = 1
+
+    @minesweeperstats.timed("game.flag")
     def flag(self, x: int, y: int) -> bool:
         """
         Places or removes a flag on the given tile.
@@ -78,23 +898,36 @@ class game:
         if x < 0 or self.width <= x or y < 0 or self.height <= y:  # Ensure we are within the grid.
             raise IndexError(
                 f"Tile ({x}, {y}) is invalid for a grid of size ({self.width}, {self.height}).")
+        index = y * self.width + x
         # Your first move cannot be placing a flag. At least one tile must be opened first.
-        elif self.first:
+        if self.first:
             return False
         elif self.isGameOver() or self.isVictory():
             return False
         # You cannot place a flag on an opened tile.
-        elif self.visible[x][y] == 1:
+        elif self.visiblecells[index] == 1:
             return False
-        elif self.visible[x][y] == 0:  # Place flag
-            self.visible[x][y] = -1
+        if not self.snapshots:
+            self._snapshot()
+        if self.visiblecells[index] == 0:  # Place flag
+            self.visiblecells[index] = -1
+            if self.truecells[index] == -1:
+                self.numcorrectflags += 1
+            else:
+                self.numwrongflags += 1
+            self._journal(index << 3 | 1, array("q", (index << 4 | 1 << 2 | 0,)))
             return True
-        elif self.visible[x][y] == -1:  # Remove flag
-            self.visible[x][y] = 0
+        elif self.visiblecells[index] == -1:  # Remove flag
+            self.visiblecells[index] = 0
+            if self.truecells[index] == -1:
+                self.numcorrectflags -= 1
+            else:
+                self.numwrongflags -= 1
+            self._journal(index << 3 | 1, array("q", (index << 4 | 0 << 2 | 1,)))
             return True
         else:  # This really shouldn't happen.
             raise RuntimeError(
-                f"Tile ({x}, {y}) has an invalid visibility state of {self.visible[x][y]}.")
+                f"Tile ({x}, {y}) has an invalid visibility state of {self.visiblecells[index]}.")
 
     def getTrue(self, x: int, y: int) -> str:
         """
@@ -105,10 +938,11 @@ class game:
         if x < 0 or self.width <= x or y < 0 or self.height <= y:  # Ensure we are within the grid.
             raise IndexError(
                 f"Tile ({x}, {y}) is invalid for a grid of size ({self.width}, {self.height}).")
-        if self.truemap[x][y] < 0:  # Is bomb
+        tile = self.truecells[y * self.width + x]
+        if tile < 0:  # Is bomb
             return "Q"
         else:  # Is not bomb
-            return str(self.truemap[x][y])
+            return str(tile)
 
     def getVisible(self, x: int, y: int) -> str:
         """
@@ -123,37 +957,62 @@ class game:
         if x < 0 or self.width <= x or y < 0 or self.height <= y:  # Ensure we are within the grid.
             raise IndexError(
                 f"Tile ({x}, {y}) is invalid for a grid of size ({self.width}, {self.height}).")
-        elif self.visible[x][y] == -1:  # Flagged tile
+        state = self.visiblecells[y * self.width + x]
+        if state == -1:  # Flagged tile
             return "F"
-        elif self.visible[x][y] == 0:  # Unopened tile
+        elif state == 0:  # Unopened tile
             return "?"
-        elif self.visible[x][y] == 1:  # Opened tile
+        elif state == 1:  # Opened tile
             return self.getTrue(x, y)
         else:  # Invalid state
             raise RuntimeError(
-                f"Tile ({x}, {y}) has an invalid visibility state of {self.visible[x][y]}.")
+                f"Tile ({x}, {y}) has an invalid visibility state of {state}.")
 
     def isGameOver(self) -> bool:
-        for x in range(self.width):
-            for y in range(self.height):
-                # If we have revealed a bomb, it is game over.
-                if self.visible[x][y] == 1 and self.truemap[x][y] == -1:
-                    return True
-        return False
+        # If we have revealed a bomb, it is game over.
+        return self.detonated
 
     def isVictory(self) -> bool:
-        for x in range(self.width):
-            for y in range(self.height):
-                # If we have unopened, unflagged tiles, it is not victory.
-                if self.visible[x][y] == 0:
-                    return False
-                # If we have stepped on a bomb, it is not victory.
-                elif self.visible[x][y] == 1 and self.truemap[x][y] == -1:
-                    return False
-                # If we have an incorrectly flagged tile, it is not victory.
-                elif self.visible[x][y] == -1 and self.truemap[x][y] != -1:
-                    return False
-        return True
+        # If we have stepped on a bomb, it is not victory.
+        if self.detonated:
+            return False
+        # If we have an incorrectly flagged tile, it is not victory.
+        elif self.numwrongflags > 0:
+            return False
+        # If we have unopened, unflagged tiles, it is not victory.
+        return self.numopened + self.numcorrectflags == self.width * self.height
+
+    @minesweeperstats.timed("game.save")
+    def save(self, file: Union[str, os.PathLike, BinaryIO]):
+        """
+        Saves the game in a compact binary format, to a path or a binary file object. Load it with `load`.
+
+        Only the bombs and the opened and flagged tiles are stored, one bit per tile each.
+        """
+        if self.seed < 0 or 2 ** 64 <= self.seed:
+            raise ValueError(
+                f"Seed {self.seed} can't be saved. Seeds must fit in 64 bits.")
+        ismine = self.truecells.tobytes().translate(minemask)
+        visible = self.visiblecells.tobytes()
+        data = [saveheader.pack(savemagic, saveversion, self.first, self.width, self.height, self.numbombs, self.seed),
+                packBits(ismine),
+                packBits(visible.translate(openedmask)),
+                packBits(visible.translate(flaggedmask))]
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "wb") as f:
+                f.writelines(data)
+        else:
+            file.writelines(data)
+
+    def _rows(self, symbols: bytes) -> str:
+        """
+        Lays out a byte per tile of ASCII symbols as rows of the board, with a space after each tile.
+        """
+        spaced = bytearray(b" ") * (2 * len(symbols))
+        spaced[0::2] = symbols
+        rowlength = 2 * self.width
+        return "".join(["\n" + spaced[row:row + rowlength].decode("ascii")
+                        for row in range(0, len(spaced), rowlength)])
 
     def __str__(self) -> str:
         string = f"Mine Sweeper Game ({self.width}x{self.height}; {self.numbombs} bombs)"
@@ -161,23 +1020,118 @@ class game:
             string += " ==GAME OVER=="
         elif self.isVictory():
             string += " == VICTORY =="
-        for y in range(self.height):
-            string += "\n"
-            for x in range(self.width):
-                string += f"{self.getVisible(x, y)} "
-        return string
+        # Combine the states and tiles into one byte each, `(state + 1) * 16 + tile + 1`, which never carries.
+        codes = int.from_bytes(self.visiblecells.tobytes().translate(
+            plusone), "little") * 16 + int.from_bytes(self.truecells.tobytes().translate(plusone), "little")
+        symbols = codes.to_bytes(len(self.truecells), "little").translate(
+            visiblesymbols)
+        return string + self._rows(symbols)
 
     def showFull(self) -> str:
         """
         A `str` representation of the board similar to `str(self)` without tiles hidden.
         """
         string = f"Mine Sweeper Game ({self.width}x{self.height}; {self.numbombs} bombs)"
-        for y in range(self.height):
-            string += "\n"
-            for x in range(self.width):
-                if self.truemap[x][y] == -1:
-                    string += "Q"
-                else:
-                    string += str(self.truemap[x][y])
-                string += " "
-        return string
+        return string + self._rows(self.truecells.tobytes().translate(truesymbols))
+
+
+# `bytes.translate` tables for the bytes of `truecells` and `visiblecells`
+minemask = bytes(int(byte == 0xFF) for byte in range(256))
+openedmask = bytes(int(byte == 1) for byte in range(256))
+flaggedmask = minemask
+plusone = bytes((byte + 1) & 0xFF for byte in range(256))
+truesymbols = bytes(ord("Q") if byte == 0xFF else ord(str(byte % 10))
+                    for byte in range(256))
+# Symbols for the combined codes in `str(game)`: flagged below 16, unopened below 32, then opened tiles plus 33.
+visiblesymbols = bytes(ord("F") if byte < 16 else ord("?") if byte < 32 else truesymbols[(byte - 33) & 0xFF]
+                       for byte in range(256))
+
+
+class savedgame:
+    def __init__(self, data: Union[str, os.PathLike, bytes, memoryview, mmap.mmap]):
+        """
+        A read-only view of a game saved with `game.save`.
+
+        Given a path, the file is memory-mapped, so only the parts of the board that are looked at are read.
+        Tiles are read straight from the bit-packed planes; use `toGame` to load a playable `game`.
+        """
+        if isinstance(data, (str, os.PathLike)):
+            with open(data, "rb") as f:
+                # The mapping stays valid after the file is closed
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(data)
+        if len(self.data) < saveheader.size:
+            raise ValueError("Saved game is too short for its header.")
+        magic, version, first, self.width, self.height, self.numbombs, self.seed = saveheader.unpack_from(
+            self.data)
+        if magic != savemagic:
+            raise ValueError("Not a saved minesweeper game.")
+        if version != saveversion:
+            raise ValueError(
+                f"Saved game has format version {version}, but only version {saveversion} is supported.")
+        self.first = bool(first)
+        planesize = -(-self.width * self.height // 8)
+        if len(self.data) < saveheader.size + 3 * planesize:
+            raise ValueError(
+                f"Saved game is too short for a {self.width}x{self.height} board.")
+        self.mines = self.data[saveheader.size:saveheader.size + planesize]
+        self.opened = self.data[saveheader.size +
+                                planesize:saveheader.size + 2 * planesize]
+        self.flagged = self.data[saveheader.size +
+                                 2 * planesize:saveheader.size + 3 * planesize]
+
+    def _bit(self, plane: memoryview, x: int, y: int) -> bool:
+        if x < 0 or self.width <= x or y < 0 or self.height <= y:  # Ensure we are within the grid.
+            raise IndexError(
+                f"Tile ({x}, {y}) is invalid for a grid of size ({self.width}, {self.height}).")
+        index = y * self.width + x
+        return bool((plane[index >> 3] >> (index & 7)) & 1)
+
+    def getTrue(self, x: int, y: int) -> str:
+        """
+        Gets the true symbol for the given tile, like `game.getTrue`.
+        """
+        if self._bit(self.mines, x, y):
+            return "Q"
+        return str(sum(self._bit(self.mines, nx, ny) for nx in range(max(0, x - 1), min(self.width, x + 2))
+                       for ny in range(max(0, y - 1), min(self.height, y + 2))))
+
+    def getVisible(self, x: int, y: int) -> str:
+        """
+        Gets the player-visible symbol for the given tile, like `game.getVisible`.
+        """
+        if self._bit(self.opened, x, y):
+            return self.getTrue(x, y)
+        elif self._bit(self.flagged, x, y):
+            return "F"
+        return "?"
+
+    def toGame(self) -> game:
+        """
+        Loads the saved game into a new playable `game`.
+        """
+        board = game(self.width, self.height, self.numbombs, self.seed)
+        board.numbombs = self.numbombs
+        board.first = self.first
+        count = self.width * self.height
+        ismine = unpackBits(self.mines, count)
+        isopened = unpackBits(self.opened, count)
+        isflagged = unpackBits(self.flagged, count)
+        if not self.first:
+            zeros = bytes(self.width + 2)
+            plane = zeros + b"".join(b"\x00" + ismine[row:row + self.width] + b"\x00"
+                                     for row in range(0, count, self.width)) + zeros
+            board.truecells[:] = countNeighbors(plane, self.width, self.height)
+        # Opened is 1 and flagged is -1, so the state is `opened - flagged` as signed bytes.
+        states = (int.from_bytes(isopened, "little") + 0xFF * int.from_bytes(isflagged, "little")
+                  ).to_bytes(count, "little")
+        board.visiblecells[:] = array("b", states)
+        # Rebuild the counters from the planes
+        mines = int.from_bytes(self.mines, "little")
+        opened = int.from_bytes(self.opened, "little")
+        flagged = int.from_bytes(self.flagged, "little")
+        board.numopened = (opened & ~mines).bit_count()
+        board.numcorrectflags = (flagged & mines).bit_count()
+        board.numwrongflags = (flagged & ~mines).bit_count()
+        board.detonated = (opened & mines) != 0
+        return board
@@ -1,14 +1,30 @@
+import math
+import os
+import queue
+import sys
+import threading
+import time
 import tkinter
+from collections import OrderedDict
 from tkinter import font, simpledialog
-from tkinter.constants import LEFT, RIGHT
-from typing import Dict, List, Optional, Tuple
+from tkinter.constants import LEFT, NW, RIGHT
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from PIL import Image, ImageTk
+from PIL import Image, ImageDraw, ImageFont, ImageTk
 
 import minesweepergame
-
-bombimage = Image.open("resources/bomb.gif")
-flagimage = Image.open("resources/flag.gif")
+import minesweeperpool
+import minesweeperstats
+
+try:
+    import numpy
+except ImportError:  # Without NumPy, full atlas renders paste one tile at a time.
+    numpy = None
+
+# Icons are loaded from next to this file, so the game can be started from any directory
+resources = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+bombimage = Image.open(os.path.join(resources, "bomb.gif"))
+flagimage = Image.open(os.path.join(resources, "flag.gif"))
 colors: Dict[str, str] = {
     "0": "grey",
     "1": "blue",
@@ -20,6 +36,303 @@ colors: Dict[str, str] = {
     "7": "black",
     "8": "slate grey"
 }
+# `event.state` bits for mouse buttons being held
+buttonmasks = {1: 0x0100, 2: 0x0200, 3: 0x0400}
+# Boards with more tiles than this use `atlasview` rather than canvas items per tile
+atlasthreshold = 40000
+
+
+class atlasview:
+    # Each look a tile can have is a code into the atlas:
+    # - 0-8: Opened number, 9: Bomb, 10: Unopened, 11: Flag
+    # - 12-20: Number on a dark tile, 21: Bomb on a dark tile, 22: Bomb on a red tile (after game over)
+    looks: List[Tuple[str, Optional[str]]] = [(str(n), None) for n in range(9)] + [("Q", None), ("?", None), ("F", None)] + \
+        [(str(n), "gray32") for n in range(9)] + \
+        [("Q", "gray32"), ("Q", "red")]
+    # Most pixels the whole-board image may use
+    maxpixels = 48000000
+    # Most tiles in view that are pasted one at a time when zoomed in without NumPy
+    maxpastes = 2500
+
+    def __init__(self, gui):
+        """
+        Renders the board of a `gamegui` as a single image, for boards too large for one canvas item per tile.
+
+        The whole board is kept as one PIL `Image` at a small base tile size, built by pasting tiles from an atlas.
+        Only the part of the board in view is scaled and converted to a `PhotoImage` for display.
+        The view can be scrolled and zoomed.
+        """
+        self.gui = gui
+        self.board: minesweepergame.game = gui.board
+        tiles = self.board.width * self.board.height
+        self.basesize = max(1, min(16, math.isqrt(self.maxpixels // tiles)))
+        self.atlases: Dict[int, List[Image.Image]] = {}
+        # The look code currently drawn for each tile
+        self.codes = bytearray(tiles)
+        # Held while the board image or `codes` are changed or read, since the worker thread patches them
+        self.lock = threading.Lock()
+        self.image = Image.new(
+            "RGB", (self.board.width * self.basesize, self.board.height * self.basesize))
+        # The view, as tile size in pixels and the pixel offset of its top left corner
+        self.zoom = self.basesize
+        self.scrollx = 0
+        self.scrolly = 0
+        self.viewbox: Tuple[int, int, int, int] = (0, 0, 0, 0)  # Tiles in view
+        self.viewimage: Optional[Image.Image] = None
+        self.photo: Optional[ImageTk.PhotoImage] = None
+        self.item = gui.canvas.create_image(0, 0, anchor=NW)
+        self.render()
+
+    def atlas(self, size: int) -> List[Image.Image]:
+        """
+        Gets the tile images for every look code at the given size in pixels.
+        """
+        if size not in self.atlases:
+            tiles = []
+            try:
+                numberfont = ImageFont.load_default(size=max(1, size * 3 // 4))
+            except TypeError:  # Older Pillow only has a fixed size default font
+                numberfont = ImageFont.load_default()
+            for symbol, tilecolor in self.looks:
+                tile = Image.new("RGB", (size, size), self.rgb(
+                    tilecolor or self.gui.canvas.cget("bg")))
+                draw = ImageDraw.Draw(tile)
+                if symbol == "Q" or symbol == "F":
+                    icon = (bombimage if symbol == "Q" else flagimage).convert(
+                        "RGBA").resize((size, size))
+                    tile.paste(icon, (0, 0), icon)
+                elif symbol in colors and size >= 6:
+                    draw.text((size / 2, size / 2), symbol, fill=self.rgb(
+                        colors[symbol]), font=numberfont, anchor="mm")
+                if size >= 4:
+                    draw.rectangle((0, 0, size - 1, size - 1), outline="black")
+                tiles.append(tile)
+            self.atlases[size] = tiles
+        return self.atlases[size]
+
+    def rgb(self, color: str) -> Tuple[int, int, int]:
+        """
+        Converts a Tk color name to an RGB tuple.
+        """
+        red, green, blue = self.gui.top.winfo_rgb(color)
+        return (red >> 8, green >> 8, blue >> 8)
+
+    def code(self, index: int) -> int:
+        """
+        Gets the look code that a tile should be drawn with.
+        """
+        tile = self.board.truecells[index]
+        state = self.board.visiblecells[index]
+        if self.board.isGameOver():
+            if state == 1 and tile == -1:
+                return 22
+            elif state == 0 or (state == -1 and tile != -1):
+                return 21 if tile == -1 else 12 + tile
+            return 9 if tile == -1 else tile
+        elif state == 0:
+            return 10
+        elif state == -1:
+            return 11
+        return 9 if tile == -1 else tile
+
+    def render(self):
+        """
+        Redraws the whole board image from the board, and the view.
+        """
+        self.renderImage()
+        self.updateView()
+
+    @minesweeperstats.timed("atlas.renderImage")
+    def renderImage(self):
+        """
+        Redraws the whole board image from the board. This doesn't use Tk, so it can run on the worker thread.
+        """
+        width = self.board.width
+        height = self.board.height
+        base = self.basesize
+        if numpy is not None:
+            truth = numpy.frombuffer(self.board.truecells, dtype=numpy.int8)
+            state = numpy.frombuffer(
+                self.board.visiblecells, dtype=numpy.int8)
+            bomb = truth < 0
+            shown = numpy.where(bomb, 9, truth)
+            if self.board.isGameOver():
+                dark = (state == 0) | ((state == -1) & ~bomb)
+                codes = numpy.where(dark, numpy.where(bomb, 21, truth + 12), shown)
+                codes = numpy.where((state == 1) & bomb, 22, codes)
+            else:
+                codes = numpy.where(state == 1, shown,
+                                    numpy.where(state == -1, 11, 10))
+            codes = codes.astype(numpy.uint8)
+            # Look up every tile in the atlas at once, then lay the tiles out as one image
+            atlas = numpy.stack([numpy.asarray(tile)
+                                for tile in self.atlas(base)])
+            pixels = atlas[codes.reshape(height, width)].transpose(
+                0, 2, 1, 3, 4).reshape(height * base, width * base, 3)
+            image = Image.fromarray(pixels)
+            with self.lock:
+                self.codes[:] = codes.tobytes()
+                self.image = image
+        else:
+            atlas = self.atlas(base)
+            codes = bytearray(width * height)
+            image = Image.new("RGB", self.image.size)
+            for index in range(width * height):
+                code = self.code(index)
+                codes[index] = code
+                image.paste(
+                    atlas[code], ((index % width) * base, (index // width) * base))
+            with self.lock:
+                self.codes[:] = codes
+                self.image = image
+
+    def updateTiles(self, indices: Sequence[int]):
+        """
+        Patches the given tiles (as flat indices) into the board image and the view if they changed.
+        """
+        self.showChanges(self.patchImage(indices))
+
+    @minesweeperstats.timed("atlas.patchImage")
+    def patchImage(self, indices: Sequence[int]) -> Optional[List[Tuple[int, int]]]:
+        """
+        Patches the given tiles (as flat indices) into the board image if they changed.
+        This doesn't use Tk, so it can run on the worker thread.
+
+        Returns the changed tiles as (index, look code), or `None` if the whole image was redrawn.
+        """
+        if numpy is not None and len(indices) > 4096:
+            # Big flood fills are quicker to redraw all at once
+            self.renderImage()
+            return None
+        width = self.board.width
+        base = self.basesize
+        atlas = self.atlas(base)
+        changes = []
+        with self.lock:
+            for index in indices:
+                code = self.code(index)
+                if code == self.codes[index]:
+                    continue
+                self.codes[index] = code
+                self.image.paste(
+                    atlas[code], ((index % width) * base, (index // width) * base))
+                changes.append((index, code))
+        return changes
+
+    def showChanges(self, changes: Optional[List[Tuple[int, int]]]):
+        """
+        Brings the view up to date with changes from `patchImage`.
+        """
+        if changes is None:
+            self.updateView()
+            return
+        width = self.board.width
+        base = self.basesize
+        x0, y0, x1, y1 = self.viewbox
+        inview = [(index % width, index // width, code) for index, code in changes
+                  if x0 <= index % width < x1 and y0 <= index // width < y1]
+        if not inview:
+            return
+        if self.zoom > base and len(inview) < 1000:
+            # Patch the view in place
+            zoomatlas = self.atlas(self.zoom)
+            for x, y, code in inview:
+                self.viewimage.paste(
+                    zoomatlas[code], ((x - x0) * self.zoom, (y - y0) * self.zoom))
+            self.photo.paste(self.viewimage)
+        else:
+            self.updateView()
+
+    @minesweeperstats.timed("atlas.updateView")
+    def updateView(self):
+        """
+        Rebuilds the displayed image for the tiles currently in view.
+        """
+        canvas = self.gui.canvas
+        zoom = self.zoom
+        base = self.basesize
+        # Keep the view within the board
+        self.scrollx = max(
+            0, min(self.scrollx, self.board.width * zoom - canvas.winfo_width()))
+        self.scrolly = max(
+            0, min(self.scrolly, self.board.height * zoom - canvas.winfo_height()))
+        x0 = self.scrollx // zoom
+        y0 = self.scrolly // zoom
+        x1 = min(self.board.width, -(-(self.scrollx +
+                 canvas.winfo_width()) // zoom))
+        y1 = min(self.board.height, -(-(self.scrolly +
+                 canvas.winfo_height()) // zoom))
+        if x1 <= x0 or y1 <= y0:
+            return
+        self.viewbox = (x0, y0, x1, y1)
+        width = self.board.width
+        if zoom > base and numpy is not None:
+            # Zoomed in, so build the view from full size tiles rather than stretching small ones,
+            # looking up every tile in view in the atlas at once
+            atlas = numpy.stack([numpy.asarray(tile)
+                                for tile in self.atlas(zoom)])
+            with self.lock:
+                codes = numpy.frombuffer(self.codes, dtype=numpy.uint8).reshape(
+                    self.board.height, width)[y0:y1, x0:x1].copy()
+            pixels = atlas[codes].transpose(0, 2, 1, 3, 4).reshape(
+                (y1 - y0) * zoom, (x1 - x0) * zoom, 3)
+            self.viewimage = Image.fromarray(pixels)
+        elif zoom > base and (x1 - x0) * (y1 - y0) <= self.maxpastes:
+            atlas = self.atlas(zoom)
+            self.viewimage = Image.new(
+                "RGB", ((x1 - x0) * zoom, (y1 - y0) * zoom))
+            with self.lock:
+                for y in range(y0, y1):
+                    for x in range(x0, x1):
+                        self.viewimage.paste(
+                            atlas[self.codes[y * width + x]], ((x - x0) * zoom, (y - y0) * zoom))
+        else:
+            # Too many tiles in view to paste one at a time, so the base image is stretched instead
+            with self.lock:
+                self.viewimage = self.image.crop(
+                    (x0 * base, y0 * base, x1 * base, y1 * base))
+            if zoom != base:
+                self.viewimage = self.viewimage.resize(
+                    ((x1 - x0) * zoom, (y1 - y0) * zoom), Image.BOX if zoom < base else Image.NEAREST)
+        if self.photo is None or (self.photo.width(), self.photo.height()) != self.viewimage.size:
+            self.photo = ImageTk.PhotoImage(self.viewimage)
+            canvas.itemconfigure(self.item, image=self.photo)
+        else:
+            self.photo.paste(self.viewimage)
+        canvas.coords(self.item, x0 * zoom - self.scrollx,
+                      y0 * zoom - self.scrolly)
+
+    def tileAt(self, px: int, py: int) -> Tuple[int, int]:
+        """
+        Gets the tile under a pixel of the canvas.
+        """
+        return ((px + self.scrollx) // self.zoom, (py + self.scrolly) // self.zoom)
+
+    def scroll(self, dx: int, dy: int):
+        """
+        Moves the view by the given number of pixels.
+        """
+        self.scrollx += dx
+        self.scrolly += dy
+        self.updateView()
+
+    def zoomAt(self, px: int, py: int, factor: float):
+        """
+        Changes the tile size by `factor`, keeping the board position under the given canvas pixel in place.
+        """
+        canvas = self.gui.canvas
+        # Never zoom out past the whole board fitting in the canvas
+        fitted = max(1, min(canvas.winfo_width() // self.board.width,
+                            canvas.winfo_height() // self.board.height))
+        zoom = max(fitted, min(64, round(self.zoom * factor)))
+        if zoom == self.zoom:
+            zoom = max(fitted, min(64, self.zoom + (1 if factor > 1 else -1)))
+        boardx = (px + self.scrollx) / self.zoom
+        boardy = (py + self.scrolly) / self.zoom
+        self.zoom = zoom
+        self.scrollx = int(boardx * zoom - px)
+        self.scrolly = int(boardy * zoom - py)
+        self.updateView()
 
 
 class newboarddialog(simpledialog.Dialog):
@@ -35,7 +348,7 @@ class newboarddialog(simpledialog.Dialog):
         self.widthframe = tkinter.Frame(master)
         self.widthlabel = tkinter.Label(self.widthframe, text="Width")
         self.widthbox = tkinter.Spinbox(
-            self.widthframe, from_=4, to=100, command=self.updatemaxbombs, textvariable=tkinter.IntVar(value=10))
+            self.widthframe, from_=4, to=2000, command=self.updatemaxbombs, textvariable=tkinter.IntVar(value=10))
         self.widthlabel.pack(side=LEFT)
         self.widthbox.pack(side=RIGHT)
         self.widthframe.pack()
@@ -43,7 +356,7 @@ class newboarddialog(simpledialog.Dialog):
         self.heightframe = tkinter.Frame(master)
         self.heightlabel = tkinter.Label(self.heightframe, text="Height")
         self.heightbox = tkinter.Spinbox(
-            self.heightframe, from_=4, to=100, command=self.updatemaxbombs, textvariable=tkinter.IntVar(value=10))
+            self.heightframe, from_=4, to=2000, command=self.updatemaxbombs, textvariable=tkinter.IntVar(value=10))
         self.heightlabel.pack(side=LEFT)
         self.heightbox.pack(side=RIGHT)
         self.heightframe.pack()
@@ -74,22 +387,39 @@ class newboarddialog(simpledialog.Dialog):
 
 
 class gamegui:
-    def __init__(self):
+    def __init__(self, board: Optional[Tuple[int, int, int]] = None, run: bool = True):
+        """
+        Opens the game window.
+
+        `board` gives the (width, height, bombs) of the first game, or if `None` the player is asked.
+        If `run` is `False`, the window is set up without running the event loop, e.g. for benchmarks.
+        """
         # Window
         self.top = tkinter.Tk()
         self.top.title("Minesweeper")
         self.top.configure(bd=0, bg="black")
-        self.top.iconphoto(True, tkinter.PhotoImage(file="resources/bomb.gif"))
+        self.top.iconphoto(True, tkinter.PhotoImage(file=os.path.join(resources, "bomb.gif")))
         # Canvas
         self.canvas = tkinter.Canvas(self.top, bd=0, bg="light grey")
         self.prevsize: Tuple[int, int] = (
             self.top.winfo_width(), self.top.winfo_height())
+        # Resizes are applied once the window has stopped changing size
+        self.pendingresize: Optional[str] = None
         self.canvas.pack()
         # Menu
         self.menu = tkinter.Menu(self.top)
         self.menu.add_command(label="New Game", command=self.boardDialog)
         self.menu.add_command(label="Restart", command=lambda: self.boardInit(
             self.width, self.height, self.bombs))
+        self.menu.add_command(label="Undo", command=self.undo)
+        # Large board mode draws the board as one scrollable, zoomable image
+        self.largeboard = tkinter.BooleanVar(value=False)
+        self.menu.add_checkbutton(label="Large board mode", variable=self.largeboard, command=lambda: self.boardInit(
+            self.width, self.height, self.bombs))
+        # No-guess boards can be won without guessing, starting from an opening in the middle
+        self.noguess = tkinter.BooleanVar(value=False)
+        self.menu.add_checkbutton(label="No-guess boards", variable=self.noguess, command=lambda: self.boardInit(
+            self.width, self.height, self.bombs))
         self.top.configure(menu=self.menu)
 
         # Icons
@@ -98,48 +428,155 @@ class gamegui:
         self.bombphoto = ImageTk.PhotoImage(image=bombscaled)
         flagscaled = flagimage
         self.flagphoto = ImageTk.PhotoImage(image=flagscaled)
+        # Scaled (bomb, flag) icons by tile size, most recently used last
+        self.iconcache: OrderedDict[Tuple[int, int],
+                                    Tuple[ImageTk.PhotoImage, ImageTk.PhotoImage]] = OrderedDict()
         # Font
         self.fontscaled = font.Font(
             family="Terminal", size=12, weight=font.BOLD)
         self.fontvictory = font.Font(
             family="Terminal", size=-20, weight=font.BOLD)
+        self.victoryMessage: Optional[int] = None
+        self.atlas: Optional[atlasview] = None
+
+        # Moves are played in order on a worker thread, so the window stays responsive while they run.
+        # `poll` draws their results on the Tk thread.
+        self.requests: queue.Queue = queue.Queue()
+        self.results: queue.Queue = queue.Queue()
+        self.pending = 0  # Moves submitted but not yet drawn
+        self.polling: Optional[str] = None  # The scheduled `poll`, if any
+        self.busysince = 0.0
+        self.generating = False
+        self.progress: Optional[int] = None  # Canvas item shown while moves are slow
+        self.worker = threading.Thread(target=self.work, daemon=True)
+        self.worker.start()
+        # Pre-generated no-guess boards, made by `boardPool` when first needed
+        self.pool: Optional[minesweeperpool.boardpool] = None
+        self.top.protocol("WM_DELETE_WINDOW", self.close)
 
         # Get size and initialize board
-        self.boardDialog()
+        if board is None:
+            self.boardDialog()
+        else:
+            self.boardInit(*board)
 
         # Events
         self.canvas.bind("<Button-1>", self.button1)  # Left-click
         self.canvas.bind("<Button-3>", self.button2)  # Right-click
+        self.canvas.bind("<Button-2>", self.chord)  # Middle-click
         self.top.bind("<Configure>", self.resize)  # Resize
+        self.top.bind("<Control-z>", lambda event: self.undo())
+        # Hidden instrumentation controls (see `minesweeperstats`)
+        self.top.bind("<Control-Alt-i>", lambda event: self.instrument("toggle"))
+        self.top.bind("<Control-Alt-s>", lambda event: self.instrument("stats"))
+        self.top.bind("<Control-Alt-p>", lambda event: self.instrument("profile"))
+        self.top.bind("<Control-Alt-m>", lambda event: self.instrument("memory"))
+        # Scrolling and zooming, for large board mode
+        self.canvas.bind("<MouseWheel>", lambda event: self.wheel(
+            event, 0, -event.delta))
+        self.canvas.bind("<Shift-MouseWheel>",
+                         lambda event: self.wheel(event, -event.delta, 0))
+        self.canvas.bind("<Control-MouseWheel>", lambda event: self.wheel(
+            event, 0, 0, 1.25 if event.delta > 0 else 0.8))
+        self.canvas.bind("<Button-4>", lambda event: self.wheel(event, 0, -120))
+        self.canvas.bind("<Button-5>", lambda event: self.wheel(event, 0, 120))
+        self.canvas.bind("<Shift-Button-4>",
+                         lambda event: self.wheel(event, -120, 0))
+        self.canvas.bind("<Shift-Button-5>",
+                         lambda event: self.wheel(event, 120, 0))
+        self.canvas.bind("<Control-Button-4>",
+                         lambda event: self.wheel(event, 0, 0, 1.25))
+        self.canvas.bind("<Control-Button-5>",
+                         lambda event: self.wheel(event, 0, 0, 0.8))
+        for key, dx, dy in (("Left", -1, 0), ("Right", 1, 0), ("Up", 0, -1), ("Down", 0, 1)):
+            self.top.bind(f"<{key}>", lambda event, dx=dx,
+                          dy=dy: self.wheel(event, 120*dx, 120*dy))
 
         # Run loop
-        self.top.mainloop()
+        if run:
+            self.top.mainloop()
+
+    def close(self):
+        """
+        Closes the window, stopping the pool's workers.
+        """
+        if self.pool is not None:
+            self.pool.close()
+        self.top.destroy()
+
+    def boardPool(self) -> minesweeperpool.boardpool:
+        """
+        Gets the pool of no-guess boards, which are slow to find, so are kept between games and runs.
+        It is made when first needed, since it starts worker processes and a disk cache. Call this on the Tk thread.
+        """
+        if self.pool is None:
+            self.pool = minesweeperpool.boardpool(cachedir=os.path.join(
+                os.environ.get("XDG_CACHE_HOME", "~/.cache"), "minesweeper"))
+        return self.pool
 
     def boardDialog(self):
         newboarddialog(self)
 
+    @minesweeperstats.timed("gui.boardInit")
     def boardInit(self, width: int, height: int, bombs: int):
         """
         Does the initialization stuff that needs to happen for the board.
 
         This is separate so we can reset and reinitialize the board within the same window.
+        Canvas items are reused when the new board is the same size as the old one.
         """
+        useatlas = self.largeboard.get() or width * height > atlasthreshold
+        reuse = hasattr(self, "board") and self.atlas is None and not useatlas and (
+            width, height) == (self.board.width, self.board.height)
         # New board
         self.width = width
         self.height = height
         self.bombs = bombs
         self.board = minesweepergame.game(width, height, bombs)
 
-        # New board items
+        if self.victoryMessage is not None:
+            self.canvas.delete(self.victoryMessage)
+            self.victoryMessage = None
+        if reuse:
+            # Just reset the existing tiles
+            self.render()
+        elif useatlas:
+            # The whole board is one image item, so the canvas just fills the window
+            self.canvas.delete(*self.canvas.find_all())
+            self.canvas.configure(width=self.top.winfo_width(
+            ) - 4, height=self.top.winfo_height() - 4)
+            self.atlas = atlasview(self)
+        else:
+            self.tilesInit()
+        # No-guess games start with their first tile opened on a pooled board.
+        # Bigger boards can't practically be no-guess, so they start as usual.
+        if self.noguess.get() and self.board.width * self.board.height <= minesweeperpool.noguesstiles:
+            # The pool is made here rather than on the worker thread, which `close` could race
+            self.boardPool()
+            self.submit("start", self.board.width // 2, self.board.height // 2)
+
+    def tilesInit(self):
+        """
+        Makes the canvas items for a new board, with one rectangle per tile.
+        """
         self.canvas.delete(*self.canvas.find_all())
+        self.atlas = None
         self.canvassquares: List[List[Optional[int]]] = [[None for y in range(
             self.board.height)] for x in range(self.board.width)]  # Store the `_CanvasItemId`s
         self.canvasicons: List[List[Optional[int]]] = [[None for y in range(
             self.board.height)] for x in range(self.board.width)]  # Store the `_CanvasItemId`s
-        self.victoryMessage: Optional[int] = None
-
-        # Render
-        self.render()
+        # The (symbol, tile color) currently drawn for each tile, so unchanged tiles can be skipped
+        self.tilelooks: List[List[Tuple[str, Optional[str]]]] = [[("?", None) for y in range(
+            self.board.height)] for x in range(self.board.width)]
+        # Each tile keeps one rectangle for the whole game; only its fill and icon change.
+        tilewidth = self.canvas.winfo_reqwidth()/self.board.width
+        tileheight = self.canvas.winfo_reqheight()/self.board.height
+        for x in range(self.board.width):
+            for y in range(self.board.height):
+                self.canvassquares[x][y] = self.canvas.create_rectangle(
+                    tilewidth*x, tileheight*y, tilewidth*(x+1), tileheight*(y+1), outline="black", width=1)
+        self.canvassize: Tuple[int, int] = (
+            self.canvas.winfo_reqwidth(), self.canvas.winfo_reqheight())
 
     def drawIcon(self, symbol: str, x: int, y: int, tilewidth: int = None, tileheight: int = None):
         """
@@ -155,110 +592,345 @@ class gamegui:
         if tileheight is None:
             tileheight = self.canvas.winfo_reqheight()/self.board.height
 
+        # Icons are tagged by kind so resizing can swap their images in one call.
         if symbol == "?":  # Blank tiles are not drawn.
             return
         elif symbol == "F":  # Flagged tiles.
             self.canvasicons[x][y] = self.canvas.create_image(
-                int(tilewidth*(x + 0.5)), int(tileheight*(y + 0.5)), image=self.flagphoto)
+                int(tilewidth*(x + 0.5)), int(tileheight*(y + 0.5)), image=self.flagphoto, tags="flag")
         elif symbol == "Q":
             self.canvasicons[x][y] = self.canvas.create_image(
-                int(tilewidth*(x + 0.5)), int(tileheight*(y + 0.5)), image=self.bombphoto)
+                int(tilewidth*(x + 0.5)), int(tileheight*(y + 0.5)), image=self.bombphoto, tags="bomb")
         else:  # Number tiles
             self.canvasicons[x][y] = self.canvas.create_text(tilewidth*(x + 0.5), tileheight*(
                 y + 0.5), text=symbol, justify="center", fill=colors[symbol], font=self.fontscaled)
 
+    def tileLook(self, x: int, y: int, board: Optional[minesweepergame.game] = None) -> Tuple[str, Optional[str]]:
+        """
+        Gets the symbol and tile color (or `None` for no fill) that a tile should be drawn with.
+
+        `board` is the game to look at, by default the current one.
+        """
+        if board is None:
+            board = self.board
+        if board.isGameOver():
+            index = y * board.width + x
+            visible = board.visiblecells[index]
+            # The opened bomb should have a bright red tile
+            if board.getVisible(x, y) == "Q":
+                tilecolor = "red"
+            # Mark tiles that are unopened or incorrectly flagged
+            elif visible == 0 or (visible == -1 and board.truecells[index] != -1):
+                tilecolor = "gray32"
+            else:
+                tilecolor = None
+            return (board.getTrue(x, y), tilecolor)
+        return (board.getVisible(x, y), None)
+
+    def updateTile(self, x: int, y: int, tilewidth: int = None, tileheight: int = None,
+                   look: Optional[Tuple[str, Optional[str]]] = None):
+        """
+        Redraws a tile if its look has changed, reusing its existing canvas items where possible.
+
+        `look` may be given if it was already found with `tileLook`.
+        """
+        if look is None:
+            look = self.tileLook(x, y)
+        oldlook = self.tilelooks[x][y]
+        if look == oldlook:
+            return
+        symbol, tilecolor = look
+        if tilecolor != oldlook[1]:
+            self.canvas.itemconfigure(
+                self.canvassquares[x][y], fill=tilecolor or "")
+        if symbol != oldlook[0]:
+            icon = self.canvasicons[x][y]
+            if icon is not None and symbol in colors and oldlook[0] in colors:
+                # Number to number only needs the text changed
+                self.canvas.itemconfigure(
+                    icon, text=symbol, fill=colors[symbol])
+            else:
+                if icon is not None:
+                    self.canvas.delete(icon)
+                    self.canvasicons[x][y] = None
+                self.drawIcon(symbol, x, y, tilewidth, tileheight)
+        self.tilelooks[x][y] = look
+
+    @minesweeperstats.timed("gui.render")
     def render(self):
+        """
+        Brings every tile up to date with the board. Only tiles that changed are redrawn.
+        """
+        minesweeperstats.count("gui.tilesChecked", self.board.width * self.board.height)
+        if self.atlas is not None:
+            self.atlas.render()
+            return
         tilewidth = self.canvas.winfo_reqwidth()/self.board.width
         tileheight = self.canvas.winfo_reqheight()/self.board.height
         for x in range(self.board.width):
-            # We go through and replace a line at a time, deleting the whole line at once.
-            self.canvas.delete(
-                *filter(lambda i: i is not None, self.canvassquares[x]))
-            self.canvas.delete(
-                *filter(lambda i: i is not None, self.canvasicons[x]))
-            # We have to make icons None since flags that have been removed won't overwrite.
-            self.canvasicons[x] = [None for y in range(self.board.height)]
-
             for y in range(self.board.height):
-                if self.board.isGameOver():
-                    # == Tiles ==
-                    # The opened bomb should have a bright red tile
-                    if self.board.getVisible(x, y) == "Q":
-                        tilecolor = "red"
-                    # Mark tiles that are unopened or incorrectly flagged
-                    elif self.board.visible[x][y] == 0 or (self.board.visible[x][y] == -1 and self.board.truemap[x][y] != -1):
-                        tilecolor = "gray32"
-                    else:
-                        tilecolor = None
-                    self.canvassquares[x][y] = self.canvas.create_rectangle(
-                        tilewidth*x, tileheight*y, tilewidth*(x+1), tileheight*(y+1), outline="black", width=1, fill=tilecolor)
-                    # == Icons ==
-                    self.drawIcon(self.board.getTrue(x, y),
-                                  x, y, tilewidth, tileheight)
-                else:
-                    self.canvassquares[x][y] = self.canvas.create_rectangle(
-                        tilewidth*x, tileheight*y, tilewidth*(x+1), tileheight*(y+1), outline="black", width=1)
-                    self.drawIcon(self.board.getVisible(x, y),
-                                  x, y, tilewidth, tileheight)
-
-    def checkVictory(self):
-        if self.board.isVictory():
+                self.updateTile(x, y, tilewidth, tileheight)
+
+    def tileAt(self, event: tkinter.Event) -> Optional[Tuple[int, int]]:
+        """
+        Gets the tile under the mouse for an event, or `None` if it is outside the board.
+        """
+        if self.atlas is not None:
+            x, y = self.atlas.tileAt(event.x, event.y)
+        else:
+            # Calculate board position relative to pixels
+            x = int(event.x/(self.canvas.winfo_reqwidth()/self.board.width))
+            y = int(event.y/(self.canvas.winfo_reqheight()/self.board.height))
+        if 0 <= x and x < self.board.width and 0 <= y and y < self.board.height:
+            return (x, y)
+        return None
+
+    @minesweeperstats.timed("gui.updateTiles")
+    def updateTiles(self, indices):
+        """
+        Redraws the given tiles (as flat indices) if they changed.
+        """
+        minesweeperstats.count("gui.tilesChecked", len(indices))
+        if self.atlas is not None:
+            self.atlas.updateTiles(indices)
+            return
+        width = self.board.width
+        tilewidth = self.canvas.winfo_reqwidth()/self.board.width
+        tileheight = self.canvas.winfo_reqheight()/self.board.height
+        for i in indices:
+            self.updateTile(i % width, i // width, tilewidth, tileheight)
+
+    def instrument(self, action: str):
+        """
+        Handles the hidden instrumentation keys. Files are written to the working directory.
+        - `toggle`: Turns recording of counters and latencies on or off
+        - `stats`: Writes the recorded stats as JSON
+        - `profile`: Starts the profiler, or stops it and writes its stats
+        - `memory`: Writes a `tracemalloc` snapshot
+        """
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        if action == "toggle":
+            minesweeperstats.setEnabled(not minesweeperstats.enabled)
+            print(f"Instrumentation {'on' if minesweeperstats.enabled else 'off'}", file=sys.stderr)
+        elif action == "stats":
+            path = f"minesweeper-stats-{stamp}.json"
+            minesweeperstats.dump(path)
+            print(f"Wrote {path}", file=sys.stderr)
+        elif action == "profile":
+            if minesweeperstats.profiler is None:
+                minesweeperstats.startProfile()
+                print("Profiling", file=sys.stderr)
+            else:
+                path = f"minesweeper-profile-{stamp}.out"
+                minesweeperstats.stopProfile(path)
+                print(f"Wrote {path}", file=sys.stderr)
+        elif action == "memory":
+            path = f"minesweeper-memory-{stamp}.out"
+            minesweeperstats.snapshotMemory(path)
+            print(f"Wrote {path}", file=sys.stderr)
+
+    def undo(self):
+        """
+        Undoes the last move, including one that ended the game.
+        """
+        self.submit("undo")
+
+    def submit(self, kind: str, *args):
+        """
+        Queues a move on the current board for the worker thread. Moves are played one at a time, in the order given.
+        - `open`, `flag`, `chord`: Given the tile's `x` and `y`
+        - `start`: Opens the given tile on a no-guess board from the pool
+        - `undo`: Undoes the last move
+        """
+        if (kind == "open" or kind == "start") and self.board.first:
+            self.generating = True
+        if self.pending == 0:
+            self.busysince = time.perf_counter()
+        self.pending += 1
+        self.requests.put((self.board, self.atlas, kind, args))
+        if self.polling is None:
+            self.polling = self.top.after(16, self.poll)
+
+    def work(self):
+        """
+        Plays queued moves forever. This runs on the worker thread, so it must not use Tk.
+        """
+        while True:
+            board, atlas, kind, args = self.requests.get()
+            try:
+                result = self.play(board, atlas, kind, args)
+            except Exception as error:  # Raised again on the Tk thread by `poll`
+                result = error
+            self.results.put((board, result))
+            self.requests.task_done()
+
+    def play(self, board: minesweepergame.game, atlas: Optional[atlasview], kind: str, args: Tuple):
+        """
+        Plays a move on the worker thread, and works out what needs to be redrawn.
+
+        Returns `None` if nothing changed, or (`kind`, changes, whether the game is won). The changes are
+        from `atlasview.patchImage` in large board mode, or (index, look) for each tile that may have changed.
+        """
+        width = board.width
+        if kind == "undo":
+            if not board.undo():
+                return None
+            # Undoing can end or resume the game, which changes how every tile looks
+            changed: Sequence[int] = range(width * board.height)
+        else:
+            if board.isGameOver() or board.isVictory():
+                return None
+            x, y = args
+            if kind == "start":
+                if board.first:
+                    ready = self.pool.layout(
+                        width, board.height, board.numbombs, x, y, noguess=True)
+                    if ready is not None:
+                        board.seed, truecells = ready
+                        board.adopt(truecells)
+                kind = "open"
+            if kind == "open":
+                # We can't open the tile if it's flagged or already open.
+                if board.visiblecells[y * width + x] != 0:
+                    return None
+                changed = board.openCells(x, y)
+            elif kind == "flag":
+                changed = (y * width + x,) if board.flag(x, y) else ()
+            else:
+                changed = board.chord(x, y)
+            if board.isGameOver():
+                # We stepped on a bomb, which reveals the whole board
+                changed = range(width * board.height)
+        if atlas is not None:
+            changes = atlas.patchImage(changed)
+        else:
+            changes = [(index, self.tileLook(index % width, index // width, board))
+                       for index in changed]
+        return (kind, changes, board.isVictory())
+
+    def poll(self):
+        """
+        Draws the results of moves the worker thread has finished, and shows progress while it is busy.
+
+        This runs on the Tk thread every 16 ms while moves are pending.
+        """
+        self.polling = None
+        error = None
+        while True:
+            try:
+                board, result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            if isinstance(result, Exception):
+                error = result
+            elif result is not None and board is self.board:  # Results for an old board are dropped
+                self.show(*result)
+        if self.pending:
+            self.showProgress()
+            self.polling = self.top.after(16, self.poll)
+        else:
+            self.generating = False
+            if self.progress is not None:
+                self.canvas.delete(self.progress)
+                self.progress = None
+        if error is not None:
+            raise error
+
+    def show(self, kind: str, changes, victory: bool):
+        """
+        Draws the result of a move from `play`.
+        """
+        if self.atlas is not None:
+            self.atlas.showChanges(changes)
+        else:
+            width = self.board.width
+            tilewidth = self.canvas.winfo_reqwidth()/self.board.width
+            tileheight = self.canvas.winfo_reqheight()/self.board.height
+            minesweeperstats.count("gui.tilesChecked", len(changes))
+            for index, look in changes:
+                self.updateTile(index % width, index // width,
+                                tilewidth, tileheight, look)
+        if kind == "undo" and self.victoryMessage is not None:
+            self.canvas.delete(self.victoryMessage)
+            self.victoryMessage = None
+        if victory:
             if self.victoryMessage is not None:
                 self.canvas.delete(self.victoryMessage)
             self.victoryMessage = self.canvas.create_text(self.canvas.winfo_width(
             )/2, self.canvas.winfo_height()/2, text="VICTORY", font=self.fontvictory)
 
+    def showProgress(self):
+        """
+        Shows an animated message once moves have been pending for a moment, such as while a big board is generated.
+        """
+        elapsed = time.perf_counter() - self.busysince
+        if elapsed < 0.1:
+            return
+        text = ("Generating board" if self.generating else "Working") + \
+            "." * (int(elapsed * 4) % 4)
+        if self.progress is None:
+            self.progress = self.canvas.create_text(self.canvas.winfo_width(
+            )/2, self.canvas.winfo_height()/2, text=text, font=self.fontvictory, fill="white")
+        else:
+            self.canvas.itemconfigure(self.progress, text=text)
+        self.canvas.tag_raise(self.progress)
+
+    def finish(self):
+        """
+        Waits for the worker thread to play every queued move, then draws them.
+        """
+        self.requests.join()
+        if self.polling is not None:
+            self.top.after_cancel(self.polling)
+        self.poll()
+
+    @minesweeperstats.timed("gui.button1")
     def button1(self, event: tkinter.Event):
-        if self.board.isGameOver() or self.board.isVictory():
+        if event.state & buttonmasks[3]:  # Both buttons are down
+            self.chord(event)
             return
-        # Calculate board position relative to pixels
-        tilewidth = self.canvas.winfo_reqwidth()/self.board.width
-        tileheight = self.canvas.winfo_reqheight()/self.board.height
-        x = int(event.x/tilewidth)
-        y = int(event.y/tileheight)
-        # We can't open the tile if it's flagged or already open.
-        if self.board.visible[x][y] == 0:
-            opened = self.board.open(x, y)
-            if opened is None:
-                # We stepped on a bomb
-                self.drawIcon("Q", x, y, tilewidth, tileheight)
-                self.render()
-            else:
-                # Tile is safe.
-                for _x, _y in opened:
-                    self.drawIcon(self.board.getVisible(_x, _y),
-                                  _x, _y, tilewidth, tileheight)
-                self.checkVictory()
+        tile = self.tileAt(event)
+        if tile is not None:
+            self.submit("open", *tile)
 
+    @minesweeperstats.timed("gui.button2")
     def button2(self, event: tkinter.Event):
-        if self.board.isGameOver() or self.board.isVictory():
+        if event.state & buttonmasks[1]:  # Both buttons are down
+            self.chord(event)
             return
-        # Calculate board position relative to pixels
-        tilewidth = self.canvas.winfo_reqwidth()/self.board.width
-        tileheight = self.canvas.winfo_reqheight()/self.board.height
-        x = int(event.x/tilewidth)
-        y = int(event.y/tileheight)
-        if self.board.flag(x, y):  # Try to change the flag
-            # If something changed, draw or remove the flag.
-            if self.board.visible[x][y] == -1:  # Draw a flag
-                self.drawIcon("F", x, y, tilewidth, tileheight)
-                self.checkVictory()
-            else:
-                self.canvas.delete(self.canvasicons[x][y])
-                self.canvasicons[x][y] = None
+        tile = self.tileAt(event)
+        if tile is not None:
+            self.submit("flag", *tile)
 
+    @minesweeperstats.timed("gui.chord")
+    def chord(self, event: tkinter.Event):
+        """
+        Opens the neighbors of a number tile whose flags are all placed.
+        """
+        tile = self.tileAt(event)
+        if tile is not None:
+            self.submit("chord", *tile)
+
+    @minesweeperstats.timed("gui.canvasResize")
     def canvasResize(self, width: int, height: int):
         """
         Resizes the canvas to be the largest that will fit in the window while maintaining the board's aspect ratio.
         - Resizes canvas element
         - Resizes icons
-        - Re-renders the entire canvas
+        - Scales the existing canvas items to the new size
         """
         # Ensure board is initialized. If not, make canvas fill window.
         if not hasattr(self, "board"):
             self.canvas.configure(width=self.top.winfo_width(
             ) - 4, height=self.top.winfo_height() - 4)
             return
+        if self.atlas is not None:
+            # The atlas view keeps its tile size, so a bigger window just shows more of the board
+            self.canvas.configure(width=width - 4, height=height - 4)
+            self.canvas.update_idletasks()
+            self.atlas.updateView()
+            return
 
         boardaspectratio: float = self.board.height / self.board.width  # y/x
         canvasaspectratio: float = height / width  # y/x
@@ -273,26 +945,72 @@ class gamegui:
         # Resize icons
         iconsize = (max(1, int(canvaswidth/self.board.width)),
                     max(1, int(canvasheight/self.board.height)))
-        bombscaled = bombimage.resize(iconsize)
-        self.bombphoto = ImageTk.PhotoImage(bombscaled)
-        flagscaled = flagimage.resize(iconsize)
-        self.flagphoto = ImageTk.PhotoImage(flagscaled)
+        bombphoto, flagphoto = self.scaledIcons(iconsize)
+        if bombphoto is not self.bombphoto:
+            self.bombphoto = bombphoto
+            self.flagphoto = flagphoto
+            self.canvas.itemconfigure("bomb", image=self.bombphoto)
+            self.canvas.itemconfigure("flag", image=self.flagphoto)
         # Resize font
         # If negative, font size is measured in pixels.
-        self.fontscaled.configure(
-            size=int(canvasheight/self.board.height * -3/4))
-        # Draw
-        self.render()
-        # Resize victory message
-        if self.victoryMessage is not None:
-            self.canvas.moveto(self.victoryMessage, int(canvaswidth/2 - self.fontvictory.measure(
-                "VICTORY")/2), int(canvasheight/2 + self.fontvictory.cget("size")/2))
+        # Number tiles use this font, so they update automatically.
+        fontsize = int(canvasheight/self.board.height * -3/4)
+        if fontsize != self.fontscaled.cget("size"):
+            self.fontscaled.configure(size=fontsize)
+        # Move and stretch every item (including the victory message) rather than recreating them
+        newsize = (self.canvas.winfo_reqwidth(), self.canvas.winfo_reqheight())
+        if newsize != self.canvassize:
+            self.canvas.scale("all", 0, 0, newsize[0] / self.canvassize[0],
+                              newsize[1] / self.canvassize[1])
+            self.canvassize = newsize
+
+    def wheel(self, event: tkinter.Event, dx: int, dy: int, zoom: float = 1):
+        """
+        Scrolls the large board view by a number of wheel units (120 per notch), or zooms it around the mouse.
+        """
+        if self.atlas is None:
+            return
+        if zoom != 1:
+            self.atlas.zoomAt(event.x, event.y, zoom)
+        else:
+            step = max(self.atlas.zoom, 32)
+            self.atlas.scroll(dx * step // 40, dy * step // 40)
+
+    def scaledIcons(self, iconsize: Tuple[int, int]) -> Tuple[ImageTk.PhotoImage, ImageTk.PhotoImage]:
+        """
+        Gets the bomb and flag icons scaled to a tile size, scaling them only if they aren't cached.
+
+        The cache keeps the 8 most recently used sizes.
+        """
+        if iconsize in self.iconcache:
+            self.iconcache.move_to_end(iconsize)
+        else:
+            self.iconcache[iconsize] = (ImageTk.PhotoImage(bombimage.resize(iconsize)),
+                                        ImageTk.PhotoImage(flagimage.resize(iconsize)))
+            if len(self.iconcache) > 8:
+                self.iconcache.popitem(last=False)
+        return self.iconcache[iconsize]
 
     def resize(self, event: tkinter.Event):
-        newsize: Tuple[int, int] = (event.width, event.height)
-        if event.widget == self.top and newsize != self.prevsize:
-            self.canvasResize(event.width, event.height)
+        """
+        Schedules a resize of the canvas for when the window settles on a size.
+
+        Dragging the window edge sends many `<Configure>` events, so each one just restarts a short timer.
+        """
+        if event.widget != self.top:
+            return
+        if self.pendingresize is not None:
+            self.top.after_cancel(self.pendingresize)
+        self.pendingresize = self.top.after(
+            50, self.settleResize, event.width, event.height)
+
+    def settleResize(self, width: int, height: int):
+        self.pendingresize = None
+        newsize: Tuple[int, int] = (width, height)
+        if newsize != self.prevsize:
+            self.canvasResize(width, height)
             self.prevsize = newsize
 
 
-gamegui()
+if __name__ == "__main__":
+    gamegui()
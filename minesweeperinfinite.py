@@ -0,0 +1,268 @@
+"""
+Unbounded minesweeper boards, generated lazily in chunks.
+
+The world is split into square chunks. A chunk's mines depend only on the game's seed and the chunk's coordinates,
+so chunks are only generated when a move or lookup first touches them. Chunks that haven't been used recently are
+evicted: untouched chunks are simply dropped, and the others keep only their compressed visibility states.
+Memory use therefore grows with the explored area, not the size of the world.
+
+The tiles around (0, 0) never have mines, so games conventionally start by opening (0, 0).
+"""
+import random
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import minesweepergame
+
+# Offsets of the tiles around a tile
+around = [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dx or dy]
+
+
+class chunk:
+    def __init__(self, counts: array, visible: array):
+        """
+        A resident chunk of an `infinitegame`, with tiles stored flat in row-major order.
+
+        `counts` holds neighbor counts or -1 for bombs, and `visible` holds 0 for unopened, 1 for opened,
+        or -1 for flagged tiles, like `minesweepergame.game`.
+        """
+        self.counts = counts
+        self.visible = visible
+
+
+class infinitegame:
+    def __init__(self, density: float = 0.15, seed: Optional[int] = None, chunksize: int = 64,
+                 maxresident: int = 4096, floodlimit: int = 100000):
+        """
+        Create a new unbounded game, where each tile is a bomb with probability `density` (in steps of 1/256).
+
+        `chunksize` must be a power of two. At most `maxresident` chunks are kept uncompressed.
+        A single open reveals at most `floodlimit` tiles; the rest of a larger flood fill is left for `expand`.
+        """
+        if chunksize <= 0 or chunksize & (chunksize - 1):
+            raise ValueError(
+                f"Chunk size {chunksize} is invalid. It must be a power of two.")
+        self.chunksize = chunksize
+        self.shift = chunksize.bit_length() - 1
+        self.mask = chunksize - 1
+        self.seed: int = random.randrange(2 ** 32) if seed is None else seed
+        self.density = density
+        # Random bytes below this are bombs
+        threshold = min(256, max(0, round(density * 256)))
+        self.minetable = bytes(int(byte < threshold) for byte in range(256))
+        self.maxresident = maxresident
+        self.floodlimit = floodlimit
+        # Resident chunks, least recently used first
+        self.chunks: OrderedDict[Tuple[int, int], chunk] = OrderedDict()
+        # Compressed visibility states of evicted chunks that had been touched
+        self.stored: Dict[Tuple[int, int], bytes] = {}
+        # Opened zero tiles whose neighbors haven't been opened yet, because a flood fill hit `floodlimit`
+        self.pending: Deque[Tuple[int, int]] = deque()
+        self.numopened = 0
+        self.numflags = 0
+        self.detonated: Optional[Tuple[int, int]] = None  # Where a bomb was opened, if one was
+
+    def mines(self, cx: int, cy: int) -> bytearray:
+        """
+        Generates the bombs of a chunk, as a byte per tile (1 for bombs) in row-major order.
+        """
+        size = self.chunksize
+        rng = random.Random(f"{self.seed}:{cx}:{cy}")
+        mines = bytearray(rng.randbytes(size * size).translate(self.minetable))
+        # Keep the tiles around the origin clear, so the first move is safe
+        for y in (-1, 0, 1):
+            for x in (-1, 0, 1):
+                if x >> self.shift == cx and y >> self.shift == cy:
+                    mines[(y & self.mask) << self.shift | (x & self.mask)] = 0
+        return mines
+
+    def getChunk(self, cx: int, cy: int) -> chunk:
+        """
+        Gets a chunk, generating or restoring it if it isn't resident. This never evicts chunks (see `evict`).
+        """
+        key = (cx, cy)
+        resident = self.chunks.get(key)
+        if resident is not None:
+            self.chunks.move_to_end(key)
+            return resident
+        size = self.chunksize
+        # Counting neighbors needs the bombs of this chunk, padded by the bordering tiles of its neighbors.
+        around = {(dx, dy): self.mines(cx + dx, cy + dy)
+                  for dy in (-1, 0, 1) for dx in (-1, 0, 1)}
+        rows = []
+        for row in range(-1, size + 1):
+            dy = -1 if row < 0 else 1 if row == size else 0
+            start = (row & self.mask) * size
+            rows.append(around[(-1, dy)][start + size - 1:start + size])
+            rows.append(around[(0, dy)][start:start + size])
+            rows.append(around[(1, dy)][start:start + 1])
+        counts = minesweepergame.countNeighbors(b"".join(rows), size, size)
+        stored = self.stored.pop(key, None)
+        if stored is None:
+            visible = array("b", (0,)) * (size * size)
+        else:
+            visible = array("b", zlib.decompress(stored))
+        resident = chunk(counts, visible)
+        self.chunks[key] = resident
+        return resident
+
+    def evict(self, keep: Optional[int] = None):
+        """
+        Evicts the least recently used chunks until at most `keep` (by default `maxresident`) are resident.
+
+        Chunks nobody has touched are dropped, since they can be generated again; others keep their compressed states.
+        """
+        if keep is None:
+            keep = self.maxresident
+        while len(self.chunks) > keep:
+            key, evicted = self.chunks.popitem(last=False)
+            if evicted.visible.count(0) != len(evicted.visible):
+                self.stored[key] = zlib.compress(evicted.visible.tobytes(), 1)
+
+    def _tile(self, x: int, y: int) -> Tuple[chunk, int]:
+        """
+        Gets the chunk holding a tile and the tile's index within it.
+        """
+        return (self.getChunk(x >> self.shift, y >> self.shift), (y & self.mask) << self.shift | (x & self.mask))
+
+    def open(self, x: int, y: int) -> Optional[List[Tuple[int, int]]]:
+        """
+        Opens a tile, flood filling from it if it is a zero tile.
+
+        Returns a `list` of the locations revealed, or `None` if it was a bomb. A flood fill stops after `floodlimit`
+        tiles; the remaining tiles can be revealed with `expand`.
+        """
+        if self.detonated is not None:
+            return []
+        tiles, index = self._tile(x, y)
+        state = tiles.visible[index]
+        revealed: List[Tuple[int, int]] = []
+        if state != 1:
+            if state == -1:  # Opening a flagged tile removes the flag
+                self.numflags -= 1
+            tiles.visible[index] = 1
+            if tiles.counts[index] == -1:
+                # You just stepped on a bomb.
+                self.detonated = (x, y)
+                self.evict()
+                return None
+            self.numopened += 1
+            revealed.append((x, y))
+            if tiles.counts[index] == 0:
+                self.pending.append((x, y))
+                self._flood(revealed, self.floodlimit)
+        self.evict()
+        return revealed
+
+    def expand(self, limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Continues flood fills that were stopped by `floodlimit`, revealing at most `limit` (by default `floodlimit`) tiles.
+
+        Returns a `list` of the locations revealed.
+        """
+        revealed: List[Tuple[int, int]] = []
+        self._flood(revealed, self.floodlimit if limit is None else limit)
+        self.evict()
+        return revealed
+
+    def _flood(self, revealed: List[Tuple[int, int]], limit: int):
+        """
+        Opens the neighbors of pending zero tiles until `limit` tiles are in `revealed`.
+        """
+        pending = self.pending
+        shift = self.shift
+        mask = self.mask
+        # Most neighbors are in the same chunk as the last one, so skip the lookup for those.
+        lastkey = None
+        tiles = None
+        opened = 0
+        while pending and len(revealed) < limit:
+            x, y = pending.popleft()
+            for dx, dy in around:
+                nx = x + dx
+                ny = y + dy
+                key = (nx >> shift, ny >> shift)
+                if key != lastkey:
+                    tiles = self.getChunk(*key)
+                    lastkey = key
+                index = (ny & mask) << shift | (nx & mask)
+                state = tiles.visible[index]
+                if state == 1:
+                    continue
+                if len(revealed) == limit:
+                    # The rest of this tile's neighbors are opened by the next `expand`
+                    pending.appendleft((x, y))
+                    break
+                # Tiles next to a zero tile can never be bombs.
+                if state == -1:
+                    self.numflags -= 1
+                tiles.visible[index] = 1
+                opened += 1
+                revealed.append((nx, ny))
+                if tiles.counts[index] == 0:
+                    pending.append((nx, ny))
+        self.numopened += opened
+
+    def flag(self, x: int, y: int) -> bool:
+        """
+        Places or removes a flag on the given tile.
+
+        Returns `True` if it changed the tile, or `False` if already open/game has ended.
+        """
+        if self.detonated is not None:
+            return False
+        tiles, index = self._tile(x, y)
+        state = tiles.visible[index]
+        if state == 1:
+            return False
+        tiles.visible[index] = -1 if state == 0 else 0
+        self.numflags += 1 if state == 0 else -1
+        self.evict()
+        return True
+
+    def getTrue(self, x: int, y: int) -> str:
+        """
+        Gets the true symbol for the given tile, like `minesweepergame.game.getTrue`. This generates its chunk.
+        """
+        tiles, index = self._tile(x, y)
+        tile = tiles.counts[index]
+        if tile < 0:  # Is bomb
+            return "Q"
+        else:  # Is not bomb
+            return str(tile)
+
+    def getVisible(self, x: int, y: int) -> str:
+        """
+        Gets the player-visible symbol for a given tile, like `minesweepergame.game.getVisible`.
+
+        Looking at tiles of chunks that have never been touched doesn't generate them.
+        """
+        key = (x >> self.shift, y >> self.shift)
+        if key not in self.chunks and key not in self.stored:
+            return "?"
+        tiles, index = self._tile(x, y)
+        state = tiles.visible[index]
+        if state == -1:  # Flagged tile
+            return "F"
+        elif state == 0:  # Unopened tile
+            return "?"
+        return self.getTrue(x, y)
+
+    def view(self, x: int, y: int, width: int, height: int) -> List[str]:
+        """
+        Gets the player-visible symbols of a rectangle of tiles with its top left at (`x`, `y`), as rows of text.
+        """
+        rows = ["".join([self.getVisible(vx, vy) for vx in range(x, x + width)])
+                for vy in range(y, y + height)]
+        self.evict()
+        return rows
+
+    def isGameOver(self) -> bool:
+        # If we have revealed a bomb, it is game over.
+        return self.detonated is not None
+
+    def __str__(self) -> str:
+        return f"Infinite Mine Sweeper Game ({self.density:.0%} bombs; {self.numopened} opened; " \
+            f"{len(self.chunks)} chunks resident, {len(self.stored)} stored)"
@@ -0,0 +1,349 @@
+"""
+A pool of pre-generated board layouts, so new games can start without generating their board on the first click.
+
+Layouts are kept per configuration: the board size, bomb count, first opened tile, and whether the board must be
+solvable without guessing. No-guess boards can take many attempts each, so pools are refilled by background worker
+processes, and spare layouts are kept in a disk cache between runs.
+
+Usage:
+    pool = boardpool(cachedir="~/.cache/minesweeper")
+    pool.warm(30, 16, 99, 15, 8, noguess=True)
+    board = pool.newGame(30, 16, 99, 15, 8, noguess=True)
+    board.openCells(15, 8)
+"""
+import multiprocessing
+import os
+import random
+import re
+import threading
+import time
+from array import array
+from collections import deque
+from concurrent import futures
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+import minesweepergame
+import minesweepersolver
+
+# A pool configuration: (width, height, bombs, first x, first y, no-guess)
+config = Tuple[int, int, int, int, int, bool]
+# Cached layout files are named after their configuration and seed
+cachename = re.compile(r"(\d+)x(\d+)-(\d+)-(\d+)-(\d+)-(ng|any)-(\d+)\.msl")
+# Most tiles a no-guess board can have. Bigger boards take seconds per attempt, and rarely pass, so are made as usual.
+noguesstiles = 10000
+# Set in a pool's worker processes when the pool is closed, so their jobs stop between attempts
+stopping = None
+
+
+def stopWith(event):
+    """
+    Sets up a worker process to stop its jobs once `event` is set.
+    """
+    global stopping
+    stopping = event
+
+
+def isNoGuess(truecells: array, width: int, height: int, x: int, y: int) -> bool:
+    """
+    Checks whether a layout can be won from its first tile (`x`, `y`) without guessing, using `minesweepersolver`.
+
+    The solver doesn't reason about the total number of bombs, so a few boards that need it are rejected.
+    """
+    board = minesweepergame.game(width, height, 1)
+    board.adopt(truecells)
+    board.openCells(x, y)
+    boardsolver = minesweepersolver.solver(board)
+    goal = board.width * board.height - board.numbombs
+    while board.numopened < goal:
+        if board.isGameOver():
+            return False
+        boardsolver.deduce()
+        if not boardsolver.safe:
+            result = boardsolver.solve()
+            if not boardsolver.safe:
+                if result.interior != 0:
+                    return False
+                # Every bomb is accounted for on the frontier, so the rest of the board is safe
+                boardsolver.safe.update(index for index, state in enumerate(board.visiblecells)
+                                        if state == 0 and index not in boardsolver.mines)
+        opened = board.openMany([(index % board.width, index // board.width)
+                                 for index in sorted(boardsolver.safe)])
+        if len(opened) == 0:
+            return False
+        boardsolver.update(opened)
+    return True
+
+
+def makeLayout(width: int, height: int, bombs: int, x: int, y: int, noguess: bool = False,
+               seed: Optional[int] = None, attempts: int = 10000,
+               budget: Optional[float] = None) -> Optional[Tuple[int, bytes]]:
+    """
+    Generates a layout for a configuration, with the same boards as `minesweepergame.game` for each seed.
+
+    No-guess layouts take the first of up to `attempts` seeds that passes `isNoGuess`, giving up once `budget`
+    seconds have passed if it is given, or once the pool running the job is closed. Seeds are drawn from `seed`
+    if given, or at random otherwise.
+
+    Returns the seed and the layout as the bytes of its `truecells`, or `None` if no seed passed.
+    """
+    seeds = random.Random(seed)
+    deadline = None if budget is None else time.monotonic() + budget
+    for attempt in range(attempts if noguess else 1):
+        if attempt > 0 and ((deadline is not None and time.monotonic() > deadline)
+                            or (stopping is not None and stopping.is_set())):
+            break
+        layoutseed = seeds.randrange(2 ** 63)
+        truecells = minesweepergame.generate(
+            width, height, bombs, x, y, random.Random(layoutseed))
+        if not noguess or isNoGuess(truecells, width, height, x, y):
+            return (layoutseed, truecells.tobytes())
+    return None
+
+
+class boardpool:
+    def __init__(self, size: int = 4, cachedir: Optional[str] = None, maxcache: int = 256,
+                 workers: int = 1, executor: Optional[futures.Executor] = None, budget: float = 10):
+        """
+        Keeps up to `size` layouts ready for each configuration that has been warmed with `warm`.
+
+        If `cachedir` is given, spare layouts are also stored there, at most `maxcache` files, evicting the least
+        recently used configurations first. Pools are refilled in `executor`, or in a pool of `workers` processes
+        if it is `None`. No-guess layouts are given up on after `budget` seconds.
+        """
+        self.size = size
+        self.budget = budget
+        self.cachedir = None if cachedir is None else os.path.expanduser(
+            cachedir)
+        self.maxcache = maxcache
+        self.workers = workers
+        self.executor = executor
+        # Tells the workers this pool started to stop, when it is closed
+        self.stopping = None
+        # Ready layouts as (seed, truecells bytes, cache file or `None`), oldest first
+        self.pools: Dict[config, Deque[Tuple[int, bytes, Optional[str]]]] = {}
+        self.inflight: Dict[config, int] = {}
+        # Configurations whose worker couldn't find a no-guess layout in time, so aren't refilled any more
+        self.failed: Set[config] = set()
+        # Held while the pools are changed, since workers finish on another thread
+        self.lock = threading.RLock()
+        if self.cachedir is not None:
+            os.makedirs(self.cachedir, exist_ok=True)
+
+    def key(self, width: int, height: int, bombs: int, x: int, y: int, noguess: bool) -> config:
+        """
+        Gets the configuration of a game, with its size and bombs clamped the way `minesweepergame.game` does.
+        Boards of more than `noguesstiles` tiles are never no-guess.
+        """
+        width = max(4, width)
+        height = max(4, height)
+        noguess = noguess and width * height <= noguesstiles
+        bombs = min(int(width * height / 2), max(1, bombs))
+        if x < 0 or width <= x or y < 0 or height <= y:  # Ensure we are within the grid.
+            raise IndexError(
+                f"Tile ({x}, {y}) is invalid for a grid of size ({width}, {height}).")
+        return (width, height, bombs, x, y, noguess)
+
+    def warm(self, width: int, height: int, bombs: int, x: int, y: int, noguess: bool = False):
+        """
+        Starts filling the pool for a configuration in the background, from the disk cache first.
+        """
+        key = self.key(width, height, bombs, x, y, noguess)
+        with self.lock:
+            if key not in self.pools:
+                self.pools[key] = deque(self.cached(key)[:self.size])
+            self.refill(key)
+
+    def refill(self, key: config):
+        """
+        Queues work for a configuration's pool until enough layouts are ready or being made.
+        """
+        with self.lock:
+            if key in self.failed:
+                return
+            pool = self.pools.setdefault(key, deque())
+            if self.executor is None:
+                # Workers are spawned rather than forked, since the GUI has threads of its own
+                context = multiprocessing.get_context("spawn")
+                self.stopping = context.Event()
+                self.executor = futures.ProcessPoolExecutor(
+                    self.workers, mp_context=context, initializer=stopWith, initargs=(self.stopping,))
+            while len(pool) + self.inflight.get(key, 0) < self.size:
+                self.inflight[key] = self.inflight.get(key, 0) + 1
+                job = self.executor.submit(
+                    makeLayout, *key, budget=self.budget)
+                job.add_done_callback(
+                    lambda job, key=key: self.finished(key, job))
+
+    def finished(self, key: config, job: futures.Future):
+        """
+        Adds a layout made by a worker to its pool and the disk cache.
+        """
+        with self.lock:
+            self.inflight[key] -= 1
+            if job.cancelled() or job.exception() is not None:
+                return
+            made = job.result()
+            if made is None:
+                self.failed.add(key)
+                return
+            seed, truecells = made
+            self.pools[key].append(
+                (seed, truecells, self.store(key, seed, truecells)))
+
+    def take(self, width: int, height: int, bombs: int, x: int, y: int,
+             noguess: bool = False) -> Optional[Tuple[int, array]]:
+        """
+        Takes a ready layout for a configuration without waiting, and starts refilling its pool.
+
+        Returns the layout's seed and its `truecells`, as for `minesweepergame.game.adopt`, or `None` if none are ready.
+        """
+        key = self.key(width, height, bombs, x, y, noguess)
+        with self.lock:
+            pool = self.pools.get(key)
+            if pool is None:
+                pool = self.pools[key] = deque(self.cached(key)[:self.size])
+            ready = None
+            while pool and ready is None:
+                ready = pool.popleft()
+                # Deleting the cache file claims the layout, in case another process shares the cache
+                if ready[2] is not None and not self.discard(ready[2]):
+                    ready = None
+            self.refill(key)
+        if ready is None:
+            return None
+        return (ready[0], array("b", ready[1]))
+
+    def layout(self, width: int, height: int, bombs: int, x: int, y: int,
+               noguess: bool = False) -> Optional[Tuple[int, array]]:
+        """
+        Gets a layout for a configuration, making one in the calling thread if none are ready.
+
+        Returns `None` only if no no-guess layout could be found within the pool's `budget`.
+        """
+        ready = self.take(width, height, bombs, x, y, noguess)
+        if ready is not None:
+            return ready
+        made = makeLayout(*self.key(width, height, bombs, x, y, noguess), budget=self.budget)
+        if made is None:
+            return None
+        return (made[0], array("b", made[1]))
+
+    def newGame(self, width: int, height: int, bombs: int, x: int, y: int,
+                noguess: bool = False) -> minesweepergame.game:
+        """
+        Makes a game with a pooled layout, which should be started by opening (`x`, `y`).
+
+        If no no-guess layout could be found, the game generates its board as usual on the first open.
+        """
+        ready = self.layout(width, height, bombs, x, y, noguess)
+        if ready is None:
+            return minesweepergame.game(width, height, bombs)
+        seed, truecells = ready
+        board = minesweepergame.game(width, height, bombs, seed)
+        board.adopt(truecells)
+        return board
+
+    def close(self):
+        """
+        Stops the workers. Layouts being made are dropped, but ready ones stay in the disk cache.
+
+        Workers this pool started finish their current attempt and exit, so they don't keep the program alive.
+        """
+        # The event is kept until the next executor replaces it, since workers may still be starting up
+        if self.stopping is not None:
+            self.stopping.set()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def filename(self, key: config, seed: int) -> str:
+        width, height, bombs, x, y, noguess = key
+        return f"{width}x{height}-{bombs}-{x}-{y}-{'ng' if noguess else 'any'}-{seed}.msl"
+
+    def cached(self, key: config) -> List[Tuple[int, bytes, Optional[str]]]:
+        """
+        Reads the cached layouts of a configuration, oldest first, and marks them as recently used.
+        """
+        if self.cachedir is None:
+            return []
+        width, height = key[0], key[1]
+        layouts = []
+        for name in os.listdir(self.cachedir):
+            match = cachename.fullmatch(name)
+            if match is None or self.filename(key, int(match.group(7))) != name:
+                continue
+            path = os.path.join(self.cachedir, name)
+            try:
+                with open(path, "rb") as f:
+                    packed = f.read()
+                mtime = os.stat(path).st_mtime
+                os.utime(path)
+            except OSError:  # Taken by another process
+                continue
+            if len(packed) != -(-width * height // 8):
+                continue
+            ismine = minesweepergame.unpackBits(packed, width * height)
+            paddedwidth = width + 2
+            plane = bytearray(paddedwidth * (height + 2))
+            for row in range(height):
+                start = (row + 1) * paddedwidth + 1
+                plane[start:start + width] = ismine[row *
+                                                    width:(row + 1) * width]
+            truecells = minesweepergame.countNeighbors(
+                bytes(plane), width, height)
+            layouts.append((mtime, int(match.group(7)),
+                           truecells.tobytes(), path))
+        layouts.sort()
+        return [(seed, truecells, path) for _, seed, truecells, path in layouts]
+
+    def store(self, key: config, seed: int, truecells: bytes) -> Optional[str]:
+        """
+        Writes a layout to the disk cache as a bit per tile, evicting the least recently used files if it is full.
+
+        Returns the file's path, or `None` if it wasn't cached.
+        """
+        if self.cachedir is None:
+            return None
+        path = os.path.join(self.cachedir, self.filename(key, seed))
+        try:
+            with open(path, "wb") as f:
+                f.write(minesweepergame.packBits(
+                    truecells.translate(minesweepergame.minemask)))
+            self.evict()
+        except OSError:  # The layout is still pooled, just not cached
+            return None
+        return path
+
+    def discard(self, path: str) -> bool:
+        """
+        Deletes a cache file. Returns `False` if it was already evicted, or taken by another process.
+        """
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        return True
+
+    def evict(self):
+        """
+        Deletes the least recently used cache files until at most `maxcache` are left.
+        """
+        files = []
+        for name in os.listdir(self.cachedir):
+            if cachename.fullmatch(name):
+                path = os.path.join(self.cachedir, name)
+                try:
+                    files.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    continue
+        if len(files) <= self.maxcache:
+            return
+        files.sort()
+        for _, path in files[:len(files) - self.maxcache]:
+            self.discard(path)
+        # Layouts whose files were evicted stay in their pools, but are no longer cached
+        with self.lock:
+            for pool in self.pools.values():
+                for i, (seed, truecells, path) in enumerate(pool):
+                    if path is not None and not os.path.exists(path):
+                        pool[i] = (seed, truecells, None)
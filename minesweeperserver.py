@@ -0,0 +1,376 @@
+"""
+An asyncio server hosting many headless minesweeper games, and a load generator to test it.
+
+Usage:
+    python minesweeperserver.py serve --port 8765
+    python minesweeperserver.py serve --unix /tmp/minesweeper.sock
+    python minesweeperserver.py load --port 8765 --sessions 10000 --connections 100
+
+The protocol is one JSON object per line in each direction. Every request has an `op`, and may have an `id`,
+which is echoed in its response so requests can be pipelined.
+- `{"op": "new", "width": 9, "height": 9, "bombs": 10, "seed": 1}`: Starts a game (`seed` is optional).
+  Responds with its `session` id. Boards are limited in size (see `server`).
+- `{"op": "open", "session": ..., "x": 0, "y": 0}`: Opens a tile.
+  Responds with `cells`, the revealed tiles as `[x, y, tile]` with -1 for a bomb. Opens revealing more than
+  `maxcells` tiles respond with `rows` instead, as `[y, x, symbols]`: the symbols of the revealed tiles of row `y`
+  from column `x` on, with `.` for the tiles between them that weren't revealed.
+- `{"op": "flag", "session": ..., "x": 0, "y": 0}`: Places or removes a flag.
+  Responds with whether it `changed` and whether the tile is now `flagged`.
+- `{"op": "state", "session": ..., "board": false}`: Gets the game's counters, and its visible `board` as rows of
+  symbols (as in `game.getVisible`) if asked for.
+- `{"op": "close", "session": ...}`: Ends a game.
+
+Every response has `ok`, and either `error` or the game's `state`: `"playing"`, `"won"` or `"lost"`.
+"""
+import argparse
+import asyncio
+import json
+import random
+import secrets
+import time
+from concurrent import futures
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import minesweepergame
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional and only speeds up big responses.
+    numpy = None
+
+# Boards with at least this many tiles are generated in a worker process and opened on a worker thread,
+# rather than on the event loop
+slowtiles = 250000
+# Opens revealing more tiles than this respond with `rows` rather than `cells`
+maxcells = 10000
+# The symbol of each tile in `rows`, by its byte in `game.truecells`
+rowsymbols = bytes(ord(str(byte)) if byte < 9 else ord("Q")
+                   for byte in range(256))
+
+
+class session:
+    def __init__(self, board: minesweepergame.game):
+        """
+        A game hosted by the server.
+        """
+        self.board = board
+        # Held while the board is being generated, so moves wait for it
+        self.lock = asyncio.Lock()
+        self.lastused = time.monotonic()
+
+    def state(self) -> str:
+        if self.board.isGameOver():
+            return "lost"
+        elif self.board.isVictory():
+            return "won"
+        return "playing"
+
+
+class server:
+    def __init__(self, maxsessions: int = 100000, idle: float = 3600, executor: Optional[futures.Executor] = None,
+                 maxtiles: int = 4000000):
+        """
+        Hosts games keyed by session id. Use `serve` or `serveUnix` to accept connections.
+
+        Sessions unused for `idle` seconds are closed, and boards can have at most `maxtiles` tiles.
+        Slow board generation is run in `executor`, or in a process pool if it is `None`.
+        """
+        self.sessions: Dict[str, session] = {}
+        self.maxsessions = maxsessions
+        self.maxtiles = maxtiles
+        self.idle = idle
+        self.executor = executor
+        self.connections = 0
+        self.expiry: Optional[asyncio.Task] = None
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765) -> asyncio.AbstractServer:
+        if self.expiry is None:
+            self.expiry = asyncio.create_task(self.expire())
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def serveUnix(self, path: str) -> asyncio.AbstractServer:
+        if self.expiry is None:
+            self.expiry = asyncio.create_task(self.expire())
+        return await asyncio.start_unix_server(self.handle, path)
+
+    async def expire(self):
+        """
+        Closes idle sessions every so often.
+        """
+        while True:
+            await asyncio.sleep(min(60, self.idle))
+            cutoff = time.monotonic() - self.idle
+            for key in [key for key, game in self.sessions.items() if game.lastused < cutoff]:
+                del self.sessions[key]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Answers the requests on one connection, in order.
+        """
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.respond(line)
+                writer.write(json.dumps(response, separators=(",", ":")).encode() + b"\n")
+                # Only wait for the client to catch up once a lot of output is queued
+                if writer.transport.get_write_buffer_size() > 65536:
+                    await writer.drain()
+        except (ConnectionError, ValueError):  # Disconnected, or sent a line over the stream limit
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def respond(self, line: bytes) -> Dict:
+        """
+        Answers a single request line.
+        """
+        request = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Requests must be JSON objects.")
+            op = request.get("op")
+            if op == "new":
+                response = self.new(request)
+            elif op in ("open", "flag", "state", "close"):
+                game = self.sessions.get(request.get("session"))
+                if game is None:
+                    raise KeyError(f"No session {request.get('session')!r}.")
+                game.lastused = time.monotonic()
+                if op == "open":
+                    response = await self.open(game, request)
+                elif op == "flag":
+                    response = await self.flag(game, request)
+                elif op == "state":
+                    response = await self.state(game, request)
+                else:
+                    del self.sessions[request["session"]]
+                    response = {"ok": True}
+            else:
+                raise ValueError(f"Unknown op {op!r}.")
+        # `OverflowError` is from numbers too big for an `int`, like `1e999`
+        except (ValueError, KeyError, TypeError, IndexError, RuntimeError, OverflowError) as error:
+            response = {"ok": False,
+                        "error": error.args[0] if error.args else type(error).__name__}
+        if isinstance(request, dict) and "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    def new(self, request: Dict) -> Dict:
+        if len(self.sessions) >= self.maxsessions:
+            raise RuntimeError("Too many sessions.")
+        width = int(request.get("width", 9))
+        height = int(request.get("height", 9))
+        bombs = int(request.get("bombs", 10))
+        seed = request.get("seed")
+        # Games make boards of at least 4x4
+        if max(4, width) * max(4, height) > self.maxtiles:
+            raise ValueError(
+                f"Boards can have at most {self.maxtiles} tiles.")
+        board = minesweepergame.game(
+            width, height, bombs, None if seed is None else int(seed))
+        key = secrets.token_urlsafe(12)
+        self.sessions[key] = session(board)
+        return {"ok": True, "session": key, "width": board.width, "height": board.height,
+                "bombs": board.numbombs, "seed": board.seed, "state": "playing"}
+
+    def tile(self, request: Dict) -> Tuple[int, int]:
+        return (int(request["x"]), int(request["y"]))
+
+    async def open(self, game: session, request: Dict) -> Dict:
+        x, y = self.tile(request)
+        board = game.board
+        loop = asyncio.get_running_loop()
+        async with game.lock:
+            if board.width * board.height < slowtiles:
+                opened = board.openCells(x, y)
+            else:
+                if board.first:
+                    if x < 0 or board.width <= x or y < 0 or board.height <= y:  # Ensure we are within the grid.
+                        raise IndexError(
+                            f"Tile ({x}, {y}) is invalid for a grid of size ({board.width}, {board.height}).")
+                    if self.executor is None:
+                        self.executor = futures.ProcessPoolExecutor()
+                    layout = await loop.run_in_executor(
+                        self.executor, minesweepergame.generate, board.width, board.height, board.numbombs,
+                        x, y, random.Random(board.seed))
+                    if board.first:
+                        board.adopt(layout)
+                # A big flood fill would hold up every other session on the event loop
+                opened = await loop.run_in_executor(None, board.openCells, x, y)
+        if opened is None:  # Stepped on a bomb
+            return {"ok": True, "cells": [[x, y, -1]], "state": game.state()}
+        if len(opened) > maxcells:
+            return {"ok": True, "rows": await loop.run_in_executor(None, self.rows, board, opened),
+                    "state": game.state()}
+        width = board.width
+        truecells = board.truecells
+        cells = [[i % width, i // width, truecells[i]] for i in opened]
+        return {"ok": True, "cells": cells, "state": game.state()}
+
+    def rows(self, board: minesweepergame.game, opened: array) -> List[List]:
+        """
+        Lays out the revealed tiles `opened` as `rows` for a response, with a symbol per tile rather than a list.
+        """
+        symbols = board.truecells.tobytes().translate(rowsymbols)
+        shown = bytearray(b".") * len(symbols)
+        if numpy is not None:
+            indices = numpy.frombuffer(opened, dtype=numpy.int32)
+            numpy.frombuffer(shown, dtype=numpy.uint8)[indices] = numpy.frombuffer(
+                symbols, dtype=numpy.uint8)[indices]
+        else:
+            for index in opened:
+                shown[index] = symbols[index]
+        width = board.width
+        rows = []
+        for y in range(board.height):
+            row = shown[y * width:(y + 1) * width].rstrip(b".")
+            tiles = row.lstrip(b".")
+            if tiles:
+                rows.append([y, len(row) - len(tiles), tiles.decode()])
+        return rows
+
+    async def flag(self, game: session, request: Dict) -> Dict:
+        x, y = self.tile(request)
+        async with game.lock:
+            changed = game.board.flag(x, y)
+        return {"ok": True, "changed": changed,
+                "flagged": game.board.visiblecells[y * game.board.width + x] == -1, "state": game.state()}
+
+    async def state(self, game: session, request: Dict) -> Dict:
+        board = game.board
+        async with game.lock:
+            response = {"ok": True, "width": board.width, "height": board.height, "bombs": board.numbombs,
+                        "opened": board.numopened, "flags": board.numcorrectflags + board.numwrongflags,
+                        "state": game.state()}
+            if request.get("board"):
+                if board.width * board.height < slowtiles:
+                    response["board"] = self.board(board)
+                else:
+                    response["board"] = await asyncio.get_running_loop().run_in_executor(None, self.board, board)
+        return response
+
+    def board(self, board: minesweepergame.game) -> List[str]:
+        """
+        Lays out the visible board for a `state` response, as a row of symbols per row.
+        """
+        return [row.replace(" ", "") for row in str(board).split("\n")[1:]]
+
+
+async def loadClient(connect, sessions: int, moves: int, width: int, height: int, bombs: int,
+                     latencies: List[float], counts: Dict[str, int]):
+    """
+    Plays `sessions` games one request at a time over one connection, recording the latency of every move.
+
+    Each game opens random unopened tiles until it ends or has made `moves` moves.
+    """
+    reader, writer = await connect()
+    rng = random.Random()
+
+    async def request(message: Dict) -> Dict:
+        writer.write(json.dumps(message).encode() + b"\n")
+        response = json.loads(await reader.readline())
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response
+
+    # Keep every game open at once, so the server holds `sessions` sessions
+    keys = [(await request({"op": "new", "width": width, "height": height, "bombs": bombs}))["session"]
+            for _ in range(sessions)]
+    opened = [set() for _ in keys]
+    finished = [False for _ in keys]
+    for _ in range(moves):
+        for game, key in enumerate(keys):
+            if finished[game]:
+                continue
+            while True:
+                tile = (rng.randrange(width), rng.randrange(height))
+                if tile not in opened[game]:
+                    break
+            start = time.perf_counter()
+            response = await request({"op": "open", "session": key, "x": tile[0], "y": tile[1]})
+            latencies.append(time.perf_counter() - start)
+            if "rows" in response:
+                opened[game].update((x + offset, y) for y, x, tiles in response["rows"]
+                                    for offset, symbol in enumerate(tiles) if symbol != ".")
+            else:
+                opened[game].update((x, y) for x, y, _ in response["cells"])
+            if response["state"] != "playing":
+                finished[game] = True
+                counts[response["state"]] += 1
+    for key in keys:
+        await request({"op": "close", "session": key})
+    writer.close()
+
+
+async def load(connect, sessions: int, connections: int, moves: int, width: int, height: int, bombs: int) -> Dict:
+    """
+    Runs the load generator against a server, spreading `sessions` games over `connections` connections.
+
+    Returns a summary with the move latency percentiles in milliseconds.
+    """
+    latencies: List[float] = []
+    counts = {"won": 0, "lost": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(loadClient(connect, sessions // connections + (index < sessions % connections), moves,
+                                      width, height, bombs, latencies, counts) for index in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "sessions": sessions,
+        "moves": len(latencies),
+        "won": counts["won"],
+        "lost": counts["lost"],
+        "time": elapsed,
+        "movespersecond": len(latencies) / elapsed if elapsed else 0.0,
+        "p50ms": latencies[len(latencies) // 2] * 1e3 if latencies else 0.0,
+        "p99ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3 if latencies else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Host headless minesweeper games over line-delimited JSON, or generate load for such a server.")
+    parser.add_argument("mode", choices=["serve", "load"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Use a Unix socket at this path instead of TCP.")
+    parser.add_argument("--idle", type=float, default=3600,
+                        help="Seconds before an unused session is closed.")
+    parser.add_argument("--maxtiles", type=int, default=4000000,
+                        help="Most tiles a served board can have.")
+    parser.add_argument("--sessions", type=int, default=10000,
+                        help="Games for the load generator to keep open at once.")
+    parser.add_argument("--connections", type=int, default=100,
+                        help="Connections for the load generator to spread its games over.")
+    parser.add_argument("--moves", type=int, default=10,
+                        help="Most moves the load generator makes in each game.")
+    parser.add_argument("--width", type=int, default=9)
+    parser.add_argument("--height", type=int, default=9)
+    parser.add_argument("--bombs", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.mode == "serve":
+        async def serve():
+            host = server(idle=args.idle, maxtiles=args.maxtiles)
+            listener = await (host.serveUnix(args.unix) if args.unix else host.serve(args.host, args.port))
+            async with listener:
+                await listener.serve_forever()
+        asyncio.run(serve())
+    else:
+        def connect():
+            if args.unix:
+                return asyncio.open_unix_connection(args.unix, limit=2 ** 24)
+            return asyncio.open_connection(args.host, args.port, limit=2 ** 24)
+        summary = asyncio.run(load(connect, args.sessions, args.connections, args.moves,
+                                   args.width, args.height, args.bombs))
+        print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
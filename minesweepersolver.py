@@ -0,0 +1,389 @@
+import random
+import weakref
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import minesweepergame
+
+
+class solution:
+    def __init__(self, safe: Set[Tuple[int, int]], mines: Set[Tuple[int, int]],
+                 probabilities: Dict[Tuple[int, int], float], interior: Optional[float]):
+        """
+        What a `solver` could determine about the unopened tiles of a board.
+
+        - `safe`: Tiles that are certainly not bombs
+        - `mines`: Tiles that are certainly bombs
+        - `probabilities`: The chance of each remaining frontier tile being a bomb
+        - `interior`: The chance of any unopened tile away from the frontier being a bomb, or `None` if not calculated
+        """
+        self.safe = safe
+        self.mines = mines
+        self.probabilities = probabilities
+        self.interior = interior
+
+    def probability(self, x: int, y: int) -> Optional[float]:
+        """
+        Gets the chance that an unopened tile is a bomb, or `None` if it is unknown.
+        """
+        if (x, y) in self.safe:
+            return 0.0
+        elif (x, y) in self.mines:
+            return 1.0
+        elif (x, y) in self.probabilities:
+            return self.probabilities[(x, y)]
+        return self.interior
+
+
+class solver:
+    def __init__(self, board: minesweepergame.game, maxsteps: int = 200000):
+        """
+        Finds safe tiles and bombs on a board using only what the player can see.
+        Flagged tiles are trusted to be bombs.
+
+        The frontier index is built once here, then kept up to date by passing the tiles changed by each move to `update`.
+
+        `maxsteps` limits the search when enumerating a single frontier component; larger components only get estimates.
+        """
+        self.board = board
+        self.maxsteps = maxsteps
+        # Opened number tiles next to unopened tiles, and the unopened tiles next to each of them
+        self.constraints: Dict[int, Set[int]] = {}
+        # Unopened tiles next to opened tiles, and the opened tiles next to each of them
+        self.frontier: Dict[int, Set[int]] = {}
+        # Opened tiles already in the index, as 1 or 0 for each tile
+        self.indexed = bytearray(board.width * board.height)
+        # Deductions for unopened tiles
+        self.safe: Set[int] = set()
+        self.mines: Set[int] = set()
+        # Constraints that changed since the last deduction
+        self.dirty: Set[int] = set()
+        # Enumerated frontier components, so unchanged components aren't enumerated again
+        self.components: Dict[Tuple[frozenset, frozenset],
+                              Dict[int, Tuple[int, List[int]]]] = {}
+        self.update(index for index, state in enumerate(
+            board.visiblecells) if state == 1)
+
+    def neighbors(self, index: int) -> List[int]:
+        """
+        Gets the flat indices of the tiles around the given one.
+        """
+        width = self.board.width
+        height = self.board.height
+        x = index % width
+        y = index // width
+        return [ny * width + nx for ny in (y - 1, y, y + 1) if 0 <= ny and ny < height
+                for nx in (x - 1, x, x + 1) if 0 <= nx and nx < width and (nx != x or ny != y)]
+
+    def update(self, cells: Iterable[int]):
+        """
+        Updates the frontier index for tiles whose visible state changed, given as flat indices like those from `game.openCells`.
+        """
+        visiblecells = self.board.visiblecells
+        truecells = self.board.truecells
+        for index in cells:
+            state = visiblecells[index]
+            self.safe.discard(index)
+            self.mines.discard(index)
+            if state != 1 and self.indexed[index]:
+                # An opened tile was closed again, so it no longer constrains its neighbors
+                self.indexed[index] = 0
+                for neighbor in self.constraints.pop(index, ()):
+                    constraints = self.frontier[neighbor]
+                    constraints.discard(index)
+                    if not constraints:
+                        del self.frontier[neighbor]
+            if state != 0:
+                # The tile is no longer unknown
+                for constraint in self.frontier.pop(index, ()):
+                    unknowns = self.constraints[constraint]
+                    unknowns.discard(index)
+                    if unknowns:
+                        self.dirty.add(constraint)
+                    else:
+                        del self.constraints[constraint]
+                # Only opened tiles show a number
+                if state == 1 and not self.indexed[index]:
+                    self.indexed[index] = 1
+                    if truecells[index] >= 0:
+                        unknowns = {neighbor for neighbor in self.neighbors(index)
+                                    if visiblecells[neighbor] == 0}
+                        if unknowns:
+                            self.constraints[index] = unknowns
+                            self.dirty.add(index)
+                            for neighbor in unknowns:
+                                self.frontier.setdefault(
+                                    neighbor, set()).add(index)
+            else:
+                # The tile became unknown again (such as a removed flag)
+                for neighbor in self.neighbors(index):
+                    if visiblecells[neighbor] == 1 and truecells[neighbor] >= 0:
+                        self.constraints.setdefault(neighbor, set()).add(index)
+                        self.frontier.setdefault(index, set()).add(neighbor)
+                        self.dirty.add(neighbor)
+
+    def updateFrom(self, x: int, y: int):
+        """
+        Updates the frontier index after opening (`x`, `y`) when the revealed tiles weren't kept,
+        by following the newly opened zero tiles from it.
+        """
+        visiblecells = self.board.visiblecells
+        truecells = self.board.truecells
+        start = y * self.board.width + x
+        pending = [start]
+        found = {start}
+        while pending:
+            index = pending.pop()
+            if truecells[index] == 0 and visiblecells[index] == 1:
+                for neighbor in self.neighbors(index):
+                    if neighbor not in found and visiblecells[neighbor] == 1 and not self.indexed[neighbor]:
+                        found.add(neighbor)
+                        pending.append(neighbor)
+        self.update(found)
+
+    def _effective(self, constraint: int) -> Tuple[Set[int], int]:
+        """
+        Gets the undetermined tiles around a constraint, and how many of them must be bombs.
+        """
+        visiblecells = self.board.visiblecells
+        unknowns = self.constraints[constraint]
+        flagged = sum(
+            1 for neighbor in self.neighbors(constraint) if visiblecells[neighbor] == -1)
+        mines = len(unknowns & self.mines) if self.mines else 0
+        undetermined = unknowns - self.safe - \
+            self.mines if self.safe or self.mines else set(unknowns)
+        return undetermined, self.board.truecells[constraint] - flagged - mines
+
+    def _deduce(self, cells: Iterable[int], mine: bool, pending: Set[int]):
+        """
+        Records tiles as certainly safe or certainly bombs, and queues the constraints around them.
+        """
+        known = self.mines if mine else self.safe
+        for index in cells:
+            if index not in known:
+                known.add(index)
+                pending.update(self.frontier.get(index, ()))
+
+    def deduce(self):
+        """
+        Applies the single-tile and subset rules to every constraint that changed since the last call.
+        """
+        pending = self.dirty
+        self.dirty = set()
+        while pending:
+            constraint = pending.pop()
+            if constraint not in self.constraints:
+                continue
+            unknowns, need = self._effective(constraint)
+            if not unknowns:
+                continue
+            elif need == 0:
+                self._deduce(unknowns, False, pending)
+                continue
+            elif need == len(unknowns):
+                self._deduce(unknowns, True, pending)
+                continue
+            # Subset rule: compare with every constraint sharing an undetermined tile
+            others: Set[int] = set()
+            for index in unknowns:
+                others.update(self.frontier[index])
+            others.discard(constraint)
+            for other in others:
+                otherunknowns, otherneed = self._effective(other)
+                if unknowns < otherunknowns:
+                    small, smallneed, large, largeneed = unknowns, need, otherunknowns, otherneed
+                elif otherunknowns < unknowns:
+                    small, smallneed, large, largeneed = otherunknowns, otherneed, unknowns, need
+                else:
+                    continue
+                difference = large - small
+                if largeneed == smallneed:
+                    self._deduce(difference, False, pending)
+                elif largeneed - smallneed == len(difference):
+                    self._deduce(difference, True, pending)
+
+    def _enumerate(self, cells: List[int], constraints: List[int]) -> Optional[Dict[int, Tuple[int, List[int]]]]:
+        """
+        Counts every assignment of bombs to a connected frontier component that satisfies its constraints.
+
+        Returns, for each number of bombs used, the number of solutions and how often each tile is a bomb in them,
+        or `None` if the search took more than `maxsteps` steps.
+        """
+        position = {index: i for i, index in enumerate(cells)}
+        needs: List[int] = []
+        # Constraints around each tile, and the number of tiles in each constraint after it
+        watching: List[List[int]] = [[] for _ in cells]
+        remaining: List[int] = []
+        for c, constraint in enumerate(constraints):
+            unknowns, need = self._effective(constraint)
+            needs.append(need)
+            remaining.append(len(unknowns))
+            for index in unknowns:
+                watching[position[index]].append(c)
+        placed = [0] * len(constraints)
+        assignment = [False] * len(cells)
+        results: Dict[int, Tuple[int, List[int]]] = {}
+        steps = 0
+        # Depth-first search with an explicit stack of (tile, choice)
+        stack: List[Tuple[int, bool]] = [(0, True), (0, False)]
+        depth = 0
+        while stack:
+            steps += 1
+            if steps > self.maxsteps:
+                return None
+            i, mine = stack.pop()
+            # Undo the assignments deeper than this tile
+            while depth > i:
+                depth -= 1
+                for c in watching[depth]:
+                    remaining[c] += 1
+                    if assignment[depth]:
+                        placed[c] -= 1
+            assignment[i] = mine
+            valid = True
+            for c in watching[i]:
+                remaining[c] -= 1
+                if mine:
+                    placed[c] += 1
+                if placed[c] > needs[c] or placed[c] + remaining[c] < needs[c]:
+                    valid = False
+            depth = i + 1
+            if not valid:
+                continue
+            if depth == len(cells):
+                bombs = assignment.count(True)
+                count, tallies = results.setdefault(bombs, (0, [0] * len(cells)))
+                for j, isbomb in enumerate(assignment):
+                    if isbomb:
+                        tallies[j] += 1
+                results[bombs] = (count + 1, tallies)
+            else:
+                stack.append((depth, True))
+                stack.append((depth, False))
+        return results
+
+    def solve(self, probabilities: bool = True) -> solution:
+        """
+        Finds the certainly safe tiles and bombs.
+
+        If `probabilities` is `True`, connected frontier components are also enumerated exactly to find
+        deductions the simple rules miss, and to estimate the chance of each unopened tile being a bomb.
+        Components are weighted against each other by the overall density of the remaining bombs.
+        """
+        self.deduce()
+        width = self.board.width
+        if not probabilities:
+            return solution({(index % width, index // width) for index in self.safe},
+                            {(index % width, index // width) for index in self.mines}, {}, None)
+
+        undetermined = [index for index in self.frontier
+                        if index not in self.safe and index not in self.mines]
+        unknowncount = self.board.visiblecells.count(
+            0) - len(self.safe) - len(self.mines)
+        minesleft = self.board.numbombs - \
+            self.board.visiblecells.count(-1) - len(self.mines)
+        density = min(0.999, max(0.001, minesleft / unknowncount)
+                      ) if unknowncount else 0.5
+        odds = density / (1 - density)
+        chances: Dict[int, float] = {}
+        expected = 0.0  # Bombs expected among the undetermined frontier tiles
+        components: Dict[Tuple[frozenset, frozenset],
+                         Dict[int, Tuple[int, List[int]]]] = {}
+        seen: Set[int] = set()
+        for start in undetermined:
+            if start in seen:
+                continue
+            # Collect the connected component of undetermined tiles around `start`
+            cells = [start]
+            seen.add(start)
+            constraints: Set[int] = set()
+            for index in cells:
+                for constraint in self.frontier[index]:
+                    if constraint not in constraints:
+                        constraints.add(constraint)
+                        for neighbor in self._effective(constraint)[0]:
+                            if neighbor not in seen:
+                                seen.add(neighbor)
+                                cells.append(neighbor)
+            key = (frozenset(cells), frozenset(constraints))
+            if key in self.components:
+                results = self.components[key]
+            else:
+                results = self._enumerate(cells, sorted(constraints))
+            if results is None:
+                # Too large to enumerate, so fall back to the average need of its constraints
+                for index in cells:
+                    chance = sum(need / len(unknowns) for unknowns, need in
+                                 (self._effective(c) for c in self.frontier[index])) / len(self.frontier[index])
+                    chances[index] = chance
+                    expected += chance
+                continue
+            components[key] = results
+            total = sum(count * odds ** bombs for bombs,
+                        (count, _) in results.items())
+            if total == 0:
+                continue  # Contradictory, such as from a wrong flag
+            for i, index in enumerate(cells):
+                chance = sum(tallies[i] * odds ** bombs for bombs,
+                             (_, tallies) in results.items()) / total
+                expected += chance
+                if chance == 0:
+                    self._deduce((index,), False, self.dirty)
+                elif chance == 1:
+                    self._deduce((index,), True, self.dirty)
+                else:
+                    chances[index] = chance
+        self.components = components
+        # Whatever the frontier is not expected to hold is spread over the rest
+        interiorcount = unknowncount - len(undetermined)
+        interior = min(1.0, max(0.0, (minesleft - expected) / interiorcount)
+                       ) if interiorcount > 0 else None
+        return solution({(index % width, index // width) for index in self.safe},
+                        {(index % width, index // width) for index in self.mines},
+                        {(index % width, index // width): chance for index, chance in chances.items()
+                         if index not in self.safe and index not in self.mines},
+                        interior)
+
+
+# The solver and last move for each game being played by `solverPolicy`
+policysolvers = weakref.WeakKeyDictionary()
+
+
+def solverPolicy(board: minesweepergame.game, rng: random.Random) -> Optional[Tuple[str, int, int]]:
+    """
+    A policy for `minesweeperbatch` that opens a certainly safe tile if there is one, flags a certain bomb
+    if there is one, or otherwise opens the unopened tile least likely to be a bomb.
+    """
+    width = board.width
+    if board.first:
+        move = ("open", width // 2, board.height // 2)
+        policysolvers[board] = (None, move)
+        return move
+    boardsolver, (op, x, y) = policysolvers[board]
+    if boardsolver is None:
+        boardsolver = solver(board)
+    elif op == "open":
+        boardsolver.updateFrom(x, y)
+    else:
+        boardsolver.update((y * width + x,))
+    boardsolver.deduce()
+    if not boardsolver.safe and not boardsolver.mines:
+        result = boardsolver.solve()
+    if boardsolver.safe:
+        index = min(boardsolver.safe)
+        move = ("open", index % width, index // width)
+    elif boardsolver.mines:
+        index = min(boardsolver.mines)
+        move = ("flag", index % width, index // width)
+    elif result.probabilities and (result.interior is None or min(result.probabilities.values()) <= result.interior):
+        move = ("open",) + min(result.probabilities,
+                               key=result.probabilities.get)
+    else:
+        # Guess a random tile away from the frontier
+        candidates = [index for index, state in enumerate(board.visiblecells)
+                      if state == 0 and index not in boardsolver.frontier]
+        if not candidates:
+            return None
+        index = rng.choice(candidates)
+        move = ("open", index % width, index // width)
+    policysolvers[board] = (boardsolver, move)
+    return move
@@ -0,0 +1,181 @@
+"""
+Opt-in instrumentation for the game and GUI: operation counters, latency histograms, and profiling snapshots.
+
+Instrumentation is off unless enabled, and then costs a single check per instrumented call.
+It can be enabled with environment variables:
+- `MINESWEEPER_STATS=1`: Record counters and latencies.
+- `MINESWEEPER_STATS_FILE=stats.json`: Also write them to this file when the program exits.
+- `MINESWEEPER_PROFILE=profile.out`: Profile the whole run with `cProfile`, written when the program exits.
+- `MINESWEEPER_TRACEMALLOC=memory.out`: Trace allocations, and write a `tracemalloc` snapshot when the program exits.
+
+In the GUI, Ctrl+Alt+I toggles recording, Ctrl+Alt+S dumps the stats, Ctrl+Alt+P starts or stops the profiler,
+and Ctrl+Alt+M writes a memory snapshot.
+"""
+import atexit
+import cProfile
+import functools
+import json
+import os
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, TextIO, Union
+
+enabled = os.environ.get("MINESWEEPER_STATS", "") not in ("", "0")
+
+
+class histogram:
+    def __init__(self):
+        """
+        A latency histogram with a bucket per power of two nanoseconds.
+        """
+        self.buckets: List[int] = [0] * 64
+        self.count = 0
+        self.total = 0  # Nanoseconds
+        self.max = 0
+
+    def add(self, nanoseconds: int):
+        self.buckets[min(63, nanoseconds.bit_length())] += 1
+        self.count += 1
+        self.total += nanoseconds
+        if nanoseconds > self.max:
+            self.max = nanoseconds
+
+    def percentile(self, fraction: float) -> int:
+        """
+        Gets an upper bound on a percentile of the latencies, in nanoseconds.
+        """
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return min(self.max, (1 << bucket) - 1)
+        return self.max
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "totalms": self.total / 1e6,
+            "meanus": self.total / self.count / 1e3 if self.count else 0.0,
+            "p50us": self.percentile(0.5) / 1e3,
+            "p99us": self.percentile(0.99) / 1e3,
+            "maxus": self.max / 1e3,
+            # Bucket `i` counts latencies below 2^i ns
+            "buckets": {str(bucket): count for bucket, count in enumerate(self.buckets) if count},
+        }
+
+
+counters: Dict[str, int] = {}
+histograms: Dict[str, histogram] = {}
+profiler: Optional[cProfile.Profile] = None
+
+
+def count(name: str, amount: int = 1):
+    """
+    Adds to a counter, if instrumentation is enabled.
+    """
+    if enabled:
+        counters[name] = counters.get(name, 0) + amount
+
+
+def record(name: str, nanoseconds: int):
+    """
+    Records a latency in nanoseconds under `name`. Its histogram also counts the calls.
+    """
+    if name not in histograms:
+        histograms[name] = histogram()
+    histograms[name].add(nanoseconds)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """
+    Decorates a function to record its latency under `name` whenever instrumentation is enabled.
+
+    The wrapper is an extra call even when disabled, so don't use it on trivial functions called per tile.
+    """
+    def decorate(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter_ns() - start)
+        return wrapper
+    return decorate
+
+
+def setEnabled(enable: bool):
+    global enabled
+    enabled = enable
+
+
+def reset():
+    """
+    Forgets every counter and latency recorded so far.
+    """
+    counters.clear()
+    histograms.clear()
+
+
+def stats() -> Dict:
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "enabled": enabled,
+        "counters": dict(counters),
+        "latencies": {name: histograms[name].summary() for name in sorted(histograms)},
+    }
+
+
+def dump(file: Union[str, os.PathLike, TextIO]):
+    """
+    Writes the counters and latency summaries as JSON, to a path or a text file object.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "w") as f:
+            json.dump(stats(), f, indent=1)
+    else:
+        json.dump(stats(), file, indent=1)
+
+
+def startProfile():
+    """
+    Starts profiling with `cProfile`, if it isn't already running.
+    """
+    global profiler
+    if profiler is None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+
+def stopProfile(path: Union[str, os.PathLike]):
+    """
+    Stops the profiler and writes its stats to `path`, for `pstats` or other profile viewers.
+    """
+    global profiler
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(path)
+        profiler = None
+
+
+def snapshotMemory(path: Union[str, os.PathLike]):
+    """
+    Writes a `tracemalloc` snapshot to `path`. Tracing starts on the first call, so the first snapshot is nearly empty.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracemalloc.take_snapshot().dump(path)
+
+
+if os.environ.get("MINESWEEPER_STATS_FILE"):
+    enabled = True
+    atexit.register(dump, os.environ["MINESWEEPER_STATS_FILE"])
+if os.environ.get("MINESWEEPER_PROFILE"):
+    startProfile()
+    atexit.register(stopProfile, os.environ["MINESWEEPER_PROFILE"])
+if os.environ.get("MINESWEEPER_TRACEMALLOC"):
+    tracemalloc.start()
+    atexit.register(snapshotMemory, os.environ["MINESWEEPER_TRACEMALLOC"])
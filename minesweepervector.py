@@ -0,0 +1,421 @@
+"""
+A lockstep engine that plays many small games at once, with every board held in one NumPy array.
+
+Usage:
+    python minesweepervector.py --width 9 --height 9 --bombs 10 --games 1000000 --seed 1
+
+Each step applies at most one move to every board, so per-game Python overhead is paid once per step for the
+whole batch rather than once per move. Boards match `minesweepergame.game` for the same seeds and moves:
+the same layouts, the same opened and flagged tiles, and the same wins and losses.
+"""
+import argparse
+import json
+import random
+import time
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy
+
+import minesweepergame
+
+# The kinds of move in a step, by code
+moves = ["none", "open", "flag"]
+# A vectorized policy chooses the next move for every board: (move codes, x, y), each an array with an item per board.
+policy = Callable[["vectorgame", numpy.random.Generator],
+                  Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]]
+
+
+def dilate(mask: numpy.ndarray) -> numpy.ndarray:
+    """
+    Grows a stack of boolean boards, padded by one tile on every side, to include the neighbors of every set tile.
+    The padding of the result is left clear.
+    """
+    height = mask.shape[1] - 2
+    width = mask.shape[2] - 2
+    grown = numpy.zeros_like(mask)
+    inner = grown[:, 1:-1, 1:-1]
+    for dy in (0, 1, 2):
+        for dx in (0, 1, 2):
+            inner |= mask[:, dy:dy + height, dx:dx + width]
+    return grown
+
+
+def dilateRows(rows: numpy.ndarray, width: int) -> numpy.ndarray:
+    """
+    Like `dilate`, for boards stored as a `uint64` per row with tile `x` in bit `x`, padded by one empty row
+    at the top and bottom. This does a whole row per operation, rather than a tile.
+    """
+    across = (rows | (rows << numpy.uint64(1)) | (rows >> numpy.uint64(1))
+              ) & numpy.uint64((1 << width) - 1)
+    grown = numpy.zeros_like(rows)
+    grown[:, 1:-1] = across[:, :-2] | across[:, 1:-1] | across[:, 2:]
+    return grown
+
+
+def packRows(mask: numpy.ndarray) -> numpy.ndarray:
+    """
+    Packs a stack of boolean boards (at most 64 wide) into a `uint64` per row, padded by an empty row above and below.
+    """
+    count, height, width = mask.shape
+    packed = numpy.zeros((count, height + 2, 8), dtype=numpy.uint8)
+    packed[:, 1:-1, :-(-width // 8)] = numpy.packbits(
+        mask, axis=2, bitorder="little")
+    return packed.view("<u8")[:, :, 0]
+
+
+def unpackRows(rows: numpy.ndarray, width: int) -> numpy.ndarray:
+    """
+    Unpacks boards from `packRows`, without their padding rows.
+    """
+    packed = numpy.ascontiguousarray(rows[:, 1:-1]).astype("<u8")
+    return numpy.unpackbits(packed.view(numpy.uint8).reshape(*rows.shape[:1], -1, 8),
+                            axis=2, count=width, bitorder="little").astype(bool)
+
+
+class vectorgame:
+    def __init__(self, count: int, width: int, height: int, bombs: int, seeds: Optional[Sequence[int]] = None):
+        """
+        Create `count` new games of the same size. Each board is generated when its first tile is opened.
+
+        `seeds` gives each game's seed, as for `minesweepergame.game`; if `None`, random seeds are chosen.
+        Tiles are stored as `(count, height, width)` arrays, indexed `[game, y, x]`:
+        `truecells` holds neighbor counts or -1 for bombs, and `visiblecells` holds 0 for unopened, 1 for opened,
+        or -1 for flagged tiles.
+        """
+        self.count = count
+        self.width = max(4, width)  # At least width of 4
+        self.height = max(4, height)  # At least height of 4
+        if seeds is None:
+            seeds = [random.randrange(2 ** 32) for _ in range(count)]
+        if len(seeds) != count:
+            raise ValueError(
+                f"{len(seeds)} seeds can't be used for {count} games.")
+        self.seeds: List[int] = list(seeds)
+        shape = (count, self.height, self.width)
+        self.truecells = numpy.zeros(shape, dtype=numpy.int8)
+        self.visiblecells = numpy.zeros(shape, dtype=numpy.int8)
+        # At most, half the squares. At least, 1. Small boards may fit fewer, so this is recounted when generated.
+        self.numbombs = numpy.full(count, min(
+            int(self.width * self.height / 2), max(1, bombs)), dtype=numpy.int32)
+        self.first = numpy.ones(count, dtype=bool)
+        self.detonated = numpy.zeros(count, dtype=bool)
+        self.numopened = numpy.zeros(count, dtype=numpy.int32)
+        self.numcorrectflags = numpy.zeros(count, dtype=numpy.int32)
+        self.numwrongflags = numpy.zeros(count, dtype=numpy.int32)
+
+    def generate(self, boards: numpy.ndarray, x: numpy.ndarray, y: numpy.ndarray):
+        """
+        Generates the given boards for their first opened tiles, exactly as `minesweepergame.generate` does.
+
+        Each board draws its random keys from its own seed, which is the only per-board Python work;
+        picking the smallest keys and counting neighbors is done for all of the boards at once.
+        """
+        width = self.width
+        height = self.height
+        tiles = width * height
+        count = len(boards)
+        rows = numpy.arange(count)[:, None]
+        # Tiles around the first tile must be clear, and aren't given keys
+        column = numpy.arange(tiles) % width
+        row = numpy.arange(tiles) // width
+        excluded = (numpy.abs(column - x[:, None]) <= 1) & (
+            numpy.abs(row - y[:, None]) <= 1)
+        allowed = tiles - excluded.sum(axis=1)
+        numbombs = numpy.minimum(self.numbombs[boards], allowed)
+        # Boards on an edge have more allowed tiles, so shorter key lists are padded with keys that are never picked
+        longest = int(allowed.max())
+        keys = numpy.full((count, longest), 0xFFFFFFFF, dtype=numpy.uint32)
+        rng = random.Random()
+        for length in numpy.unique(allowed).tolist():
+            group = numpy.flatnonzero(allowed == length)
+            drawn = []
+            for board in boards[group].tolist():
+                rng.seed(self.seeds[board])
+                drawn.append(rng.randbytes(4 * length))
+            keys[group, :length] = numpy.frombuffer(
+                b"".join(drawn), dtype="<u4").reshape(len(group), length)
+        # Bombs are the allowed tiles with the smallest keys, breaking ties by position
+        order = numpy.argsort(keys, axis=1, kind="stable")
+        ranks = numpy.arange(longest)[None, :]
+        # The allowed tiles in order, followed by the excluded ones for padding
+        positions = numpy.argsort(excluded, axis=1, kind="stable")[:, :longest]
+        mines = numpy.zeros((count, tiles), dtype=bool)
+        mines[rows, positions[rows, order]] = ranks < numbombs[:, None]
+        mines = mines.reshape(count, height, width)
+        # Neighbor counts are the sum of the 8 shifted copies of the padded bomb planes
+        padded = numpy.zeros((count, height + 2, width + 2), dtype=numpy.int8)
+        padded[:, 1:-1, 1:-1] = mines
+        counts = numpy.zeros((count, height, width), dtype=numpy.int8)
+        for dy in (0, 1, 2):
+            for dx in (0, 1, 2):
+                if dy != 1 or dx != 1:
+                    counts += padded[:, dy:dy + height, dx:dx + width]
+        self.truecells[boards] = numpy.where(mines, -1, counts)
+        self.numbombs[boards] = numbombs
+        self.first[boards] = False
+
+    def checkTiles(self, x: numpy.ndarray, y: numpy.ndarray, active: numpy.ndarray):
+        """
+        Ensures every active board's tile is within the grid.
+        """
+        invalid = active & ((x < 0) | (self.width <= x) |
+                            (y < 0) | (self.height <= y))
+        if invalid.any():
+            board = int(numpy.flatnonzero(invalid)[0])
+            raise IndexError(
+                f"Tile ({x[board]}, {y[board]}) is invalid for a grid of size ({self.width}, {self.height}).")
+
+    def open(self, x: Sequence[int], y: Sequence[int], active: Optional[numpy.ndarray] = None) -> numpy.ndarray:
+        """
+        Opens a tile on every active board (all of them if `active` is `None`), like `minesweepergame.game.openCells`.
+        Boards are generated on their first open, and zero tiles open their whole region.
+
+        Returns the number of tiles revealed on each board, including a bomb.
+        """
+        x = numpy.asarray(x, dtype=numpy.intp)
+        y = numpy.asarray(y, dtype=numpy.intp)
+        active = numpy.ones(self.count, dtype=bool) if active is None else numpy.asarray(
+            active, dtype=bool)
+        self.checkTiles(x, y, active)
+        revealed = numpy.zeros(self.count, dtype=numpy.int32)
+        # Finished games ignore moves, but a board's first open is always played
+        active = active & (self.first | ~(self.isGameOver() | self.isVictory()))
+        starting = numpy.flatnonzero(active & self.first)
+        if len(starting):
+            self.generate(starting, x[starting], y[starting])
+        boards = numpy.flatnonzero(active)
+        bx = x[boards]
+        by = y[boards]
+        tile = self.truecells[boards, by, bx]
+        state = self.visiblecells[boards, by, bx]
+        # Single tiles, including bombs
+        single = (tile != 0) & (state != 1)
+        sboards = boards[single]
+        stile = tile[single]
+        sstate = state[single]
+        # Opening a flagged tile removes the flag
+        self.numcorrectflags[sboards[(sstate == -1) & (stile == -1)]] -= 1
+        self.numwrongflags[sboards[(sstate == -1) & (stile != -1)]] -= 1
+        self.detonated[sboards[stile == -1]] = True
+        self.numopened[sboards[stile != -1]] += 1
+        self.visiblecells[sboards, by[single], bx[single]] = 1
+        revealed[sboards] = 1
+        # Zero tiles flood fill their region, opening it and its border
+        zero = tile == 0
+        if zero.any():
+            self.flood(boards[zero], bx[zero], by[zero], revealed)
+        return revealed
+
+    def flood(self, boards: numpy.ndarray, x: numpy.ndarray, y: numpy.ndarray, revealed: numpy.ndarray):
+        """
+        Opens the zero regions containing the given tiles by repeatedly dilating the opened zero tiles.
+        Boards drop out of the loop as their regions stop growing.
+
+        Boards up to 64 tiles wide are dilated a row at a time as bit masks, and wider ones a tile at a time.
+        """
+        height = self.height
+        width = self.width
+        count = len(boards)
+        byrows = width <= 64
+        if byrows:
+            iszero = packRows(self.truecells[boards] == 0)
+            region = numpy.zeros_like(iszero)
+            region[numpy.arange(count), y + 1] = numpy.left_shift(
+                numpy.uint64(1), x.astype(numpy.uint64))
+        else:
+            iszero = numpy.zeros((count, height + 2, width + 2), dtype=bool)
+            iszero[:, 1:-1, 1:-1] = self.truecells[boards] == 0
+            region = numpy.zeros_like(iszero)
+            region[numpy.arange(count), y + 1, x + 1] = True
+        tileaxes = tuple(range(1, region.ndim))
+        growing = numpy.arange(count)
+        # Only the zero tiles added last time can add new tiles
+        edge = region.copy()
+        while len(growing):
+            zeros = edge & iszero[growing]
+            grown = dilateRows(zeros, width) if byrows else dilate(zeros)
+            added = grown & ~region[growing]
+            region[growing] |= added
+            more = added.any(axis=tileaxes)
+            growing = growing[more]
+            edge = added[more]
+        region = unpackRows(region, width) if byrows else region[:, 1:-1, 1:-1]
+        visible = self.visiblecells[boards]
+        # Tiles next to a zero tile can never be bombs, so any flags in the region were wrong
+        opening = region & (visible != 1)
+        self.numwrongflags[boards] -= (region & (visible == -1)).sum(
+            axis=(1, 2), dtype=numpy.int32)
+        opened = opening.sum(axis=(1, 2), dtype=numpy.int32)
+        self.numopened[boards] += opened
+        revealed[boards] = opened
+        visible[region] = 1
+        self.visiblecells[boards] = visible
+
+    def flag(self, x: Sequence[int], y: Sequence[int], active: Optional[numpy.ndarray] = None) -> numpy.ndarray:
+        """
+        Places or removes a flag on every active board (all of them if `active` is `None`),
+        like `minesweepergame.game.flag`.
+
+        Returns whether each board changed.
+        """
+        x = numpy.asarray(x, dtype=numpy.intp)
+        y = numpy.asarray(y, dtype=numpy.intp)
+        active = numpy.ones(self.count, dtype=bool) if active is None else numpy.asarray(
+            active, dtype=bool)
+        self.checkTiles(x, y, active)
+        # Your first move cannot be placing a flag, and finished games ignore moves.
+        active = active & ~self.first & ~self.isGameOver() & ~self.isVictory()
+        boards = numpy.flatnonzero(active)
+        bx = x[boards]
+        by = y[boards]
+        state = self.visiblecells[boards, by, bx]
+        # You cannot place a flag on an opened tile.
+        toggled = state != 1
+        boards = boards[toggled]
+        bx = bx[toggled]
+        by = by[toggled]
+        placing = state[toggled] == 0
+        bomb = self.truecells[boards, by, bx] == -1
+        change = numpy.where(placing, 1, -1).astype(numpy.int32)
+        self.numcorrectflags[boards[bomb]] += change[bomb]
+        self.numwrongflags[boards[~bomb]] += change[~bomb]
+        self.visiblecells[boards, by, bx] = numpy.where(placing, -1, 0)
+        changed = numpy.zeros(self.count, dtype=bool)
+        changed[boards] = True
+        return changed
+
+    def step(self, codes: numpy.ndarray, x: numpy.ndarray, y: numpy.ndarray) -> numpy.ndarray:
+        """
+        Applies one move to every board, given as a code into `moves` and a tile.
+
+        Returns the number of tiles each board's move changed.
+        """
+        codes = numpy.asarray(codes)
+        changed = self.open(x, y, codes == 1)
+        flagged = self.flag(x, y, codes == 2)
+        return changed + flagged
+
+    def isGameOver(self) -> numpy.ndarray:
+        # If we have revealed a bomb, it is game over.
+        return self.detonated.copy()
+
+    def isVictory(self) -> numpy.ndarray:
+        # Every tile must be opened or correctly flagged, without a detonated bomb or a wrong flag.
+        return ~self.detonated & (self.numwrongflags == 0) & (
+            self.numopened + self.numcorrectflags == self.width * self.height)
+
+    def select(self, boards: numpy.ndarray):
+        """
+        Keeps only the given boards, in the given order, such as to stop stepping finished games.
+        """
+        boards = numpy.asarray(boards, dtype=numpy.intp)
+        self.count = len(boards)
+        self.seeds = [self.seeds[board] for board in boards.tolist()]
+        for name in ("truecells", "visiblecells", "numbombs", "first", "detonated",
+                     "numopened", "numcorrectflags", "numwrongflags"):
+            setattr(self, name, getattr(self, name)[boards])
+
+    def game(self, board: int) -> minesweepergame.game:
+        """
+        Copies one board into a `minesweepergame.game`, with its state but without a move history.
+        """
+        single = minesweepergame.game(
+            self.width, self.height, int(self.numbombs[board]), self.seeds[board])
+        if not self.first[board]:
+            single.adopt(array("b", self.truecells[board].tobytes()))
+        single.visiblecells[:] = array("b", self.visiblecells[board].tobytes())
+        single.numopened = int(self.numopened[board])
+        single.numcorrectflags = int(self.numcorrectflags[board])
+        single.numwrongflags = int(self.numwrongflags[board])
+        single.detonated = bool(self.detonated[board])
+        return single
+
+
+def randomPolicy(board: vectorgame, rng: numpy.random.Generator) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """
+    Like `minesweeperbatch.randomPolicy` for every board: opens a uniformly random unopened, unflagged tile,
+    or flags one once all of them must be bombs. Boards without any such tile make no move.
+    """
+    unopened = (board.visiblecells == 0).reshape(board.count, -1)
+    # The unopened tile with the largest random key is a uniform choice
+    keys = rng.random(unopened.shape, dtype=numpy.float32)
+    keys[~unopened] = -1
+    index = keys.argmax(axis=1)
+    left = unopened.sum(axis=1)
+    flags = (board.visiblecells == -1).sum(axis=(1, 2))
+    codes = numpy.where(left == 0, 0, numpy.where(
+        left == board.numbombs - flags, 2, 1)).astype(numpy.int8)
+    return codes, index % board.width, index // board.width
+
+
+policies: Dict[str, policy] = {
+    "random": randomPolicy,
+}
+
+
+def runBatch(width: int, height: int, bombs: int, games: int, seed: int, policyname: str = "random",
+             chunksize: int = 100000) -> Dict:
+    """
+    Plays `games` games in chunks of `chunksize` boards on this core. Game `i` uses the seed `seed + i`,
+    as in `minesweeperbatch`.
+
+    Returns a summary `dict` of the batch.
+    """
+    if policyname not in policies:
+        raise ValueError(
+            f"Unknown policy {policyname!r}. Use one of {sorted(policies)}.")
+    movepolicy = policies[policyname]
+    rng = numpy.random.default_rng(seed)
+    start = time.perf_counter()
+    wins = 0
+    moves = 0
+    for first in range(0, games, chunksize):
+        count = min(chunksize, games - first)
+        board = vectorgame(count, width, height, bombs,
+                           range(seed + first, seed + first + count))
+        # A policy that never finishes a game is stopped eventually, as in `minesweeperbatch`
+        for _ in range(4 * board.width * board.height):
+            codes, x, y = movepolicy(board, rng)
+            board.step(codes, x, y)
+            moves += int(numpy.count_nonzero(codes))
+            won = board.isVictory()
+            wins += int(won.sum())
+            # Stop stepping finished games, and games whose policy gave up
+            playing = numpy.flatnonzero((codes != 0) & ~won & ~board.isGameOver())
+            if len(playing) == 0:
+                break
+            if len(playing) < board.count:
+                board.select(playing)
+    elapsed = time.perf_counter() - start
+    return {
+        "games": games,
+        "wins": wins,
+        "winrate": wins / games if games else 0.0,
+        "moves": moves,
+        "time": elapsed,
+        "gamespersecond": games / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Play many small minesweeper games in lockstep on one core.")
+    parser.add_argument("--width", type=int, default=9)
+    parser.add_argument("--height", type=int, default=9)
+    parser.add_argument("--bombs", type=int, default=10)
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Game i of the batch uses the seed SEED + i.")
+    parser.add_argument("--policy", default="random",
+                        help=f"One of {sorted(policies)}.")
+    parser.add_argument("--chunk", type=int, default=100000,
+                        help="Games stepped together.")
+    args = parser.parse_args(argv)
+    summary = runBatch(args.width, args.height, args.bombs, args.games, args.seed,
+                       args.policy, args.chunk)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Tests for the batch runner.
+
+Run with `python -m unittest test_minesweeperbatch` or `python -m pytest`.
+"""
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from typing import List
+
+import minesweeperbatch
+
+
+def games(output: str) -> List:
+    """
+    Parses JSONL results back into (game, seed, victory, moves), in batch order.
+    """
+    results = [json.loads(line) for line in output.splitlines()]
+    return sorted((result["game"], result["seed"], result["victory"], result["moves"]) for result in results)
+
+
+class TestBatch(unittest.TestCase):
+    def testResultsDontDependOnWorkers(self):
+        runs = []
+        for jobs, chunksize in ((1, 40), (2, 7)):
+            output = io.StringIO()
+            summary = minesweeperbatch.runBatch(6, 6, 3, 40, 100, "solver", jobs, chunksize, output)
+            runs.append(games(output.getvalue()))
+            self.assertEqual(summary["games"], 40)
+            self.assertEqual(summary["wins"], sum(victory for _, _, victory, _ in runs[-1]))
+        self.assertEqual(runs[0], runs[1])
+        # Every game was played once, with its own seed
+        self.assertEqual([(game, seed) for game, seed, _, _ in runs[0]], [(i, 100 + i) for i in range(40)])
+        self.assertTrue(all(moves > 0 for _, _, _, moves in runs[0]))
+        # The same as playing the games here
+        played = minesweeperbatch.playChunk(6, 6, 3, 100, 0, 40, "solver")
+        self.assertEqual([(result["victory"], result["moves"]) for result in played],
+                         [(victory, moves) for _, _, victory, moves in runs[0]])
+
+    def testPolicies(self):
+        self.assertIs(minesweeperbatch.getPolicy("random"), minesweeperbatch.randomPolicy)
+        self.assertIs(minesweeperbatch.getPolicy("minesweeperbatch:randomPolicy"), minesweeperbatch.randomPolicy)
+        with self.assertRaises(ValueError):
+            minesweeperbatch.getPolicy("unknown")
+        # A bad name fails before any worker starts
+        with self.assertRaises(ValueError):
+            minesweeperbatch.runBatch(9, 9, 10, 10, 0, "unknown", 1)
+
+    def testCommandLine(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.jsonl")
+            summary = io.StringIO()
+            with contextlib.redirect_stderr(summary):
+                minesweeperbatch.main(["--width", "5", "--height", "5", "--bombs", "2", "--games", "25",
+                                       "--seed", "3", "--jobs", "2", "--chunk", "10", "--output", path])
+            with open(path) as f:
+                results = games(f.read())
+        self.assertEqual([game for game, _, _, _ in results], list(range(25)))
+        self.assertEqual(json.loads(summary.getvalue())["games"], 25)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,251 @@
+"""
+Tests for the game engine.
+
+Run with `python -m unittest test_minesweepergame` or `python -m pytest`.
+"""
+import io
+import os
+import random
+import tempfile
+import unittest
+from array import array
+from typing import List, Tuple
+
+import minesweepergame
+
+
+def state(board: minesweepergame.game) -> Tuple:
+    """
+    Everything about a game's progress that undoing and loading should restore.
+    """
+    return (board.visiblecells.tobytes(), board.numopened, board.numcorrectflags, board.numwrongflags,
+            board.detonated, board.isVictory(), board.isGameOver())
+
+
+def playRandomly(board: minesweepergame.game, rng: random.Random, moves: int):
+    """
+    Makes random moves of every kind, which may end the game.
+    """
+    width = board.width
+    height = board.height
+    for _ in range(moves):
+        x = rng.randrange(width)
+        y = rng.randrange(height)
+        kind = rng.random()
+        if kind < 0.3:
+            board.flag(x, y)
+        elif kind < 0.4:
+            board.flagMany([(rng.randrange(width), rng.randrange(height))
+                            for _ in range(4)])
+        elif kind < 0.5:
+            board.chord(x, y)
+        elif kind < 0.6:
+            board.openMany([(rng.randrange(width), rng.randrange(height))
+                            for _ in range(4)])
+        else:
+            board.openCells(x, y)
+
+class TestJournal(unittest.TestCase):
+    def testSeekRestoresEveryMove(self):
+        rng = random.Random(1)
+        for seed in range(40):
+            board = minesweepergame.game(
+                rng.randint(4, 40), rng.randint(4, 40), rng.randint(5, 200), seed)
+            states = [state(board)]
+            for _ in range(60):
+                playRandomly(board, rng, 1)
+                if board.cursor == len(states):
+                    states.append(state(board))
+            self.assertEqual(board.moves, len(states) - 1)
+            for _ in range(30):
+                move = rng.randrange(len(states))
+                board.seek(move)
+                self.assertEqual(state(board), states[move])
+
+    def testUndoRedoBigOpening(self):
+        # The first click opens most of a sparse board
+        board = minesweepergame.game(300, 200, 600, 5)
+        board.openCells(150, 100)
+        opened = state(board)
+        self.assertTrue(board.undo())
+        self.assertEqual(board.numopened, 0)
+        self.assertEqual(board.visiblecells.count(0), 300 * 200)
+        self.assertTrue(board.redo())
+        self.assertEqual(state(board), opened)
+
+    def testUndoingTheFirstOpenUngeneratesTheBoard(self):
+        for seed in range(20):
+            board = minesweepergame.game(9, 9, 40, seed)
+            board.openCells(0, 0)
+            self.assertTrue(board.undo())
+            self.assertTrue(board.first)
+            # Flags still can't come before the first open
+            self.assertFalse(board.flag(4, 4))
+            # The next first open is safe wherever it is, and generates the board a new game would
+            self.assertIsNotNone(board.openCells(8, 8))
+            fresh = minesweepergame.game(9, 9, 40, seed)
+            fresh.openCells(8, 8)
+            self.assertEqual(board.truecells, fresh.truecells)
+            self.assertEqual(state(board), state(fresh))
+            # The first open was replaced, so there is nothing to redo
+            self.assertFalse(board.redo())
+            self.assertEqual(board.moves, 1)
+
+    def testRedoingTheFirstOpenRestoresTheBoard(self):
+        board = minesweepergame.game(16, 16, 40, 3)
+        board.openCells(5, 5)
+        opened = state(board)
+        truecells = array("b", board.truecells)
+        board.undo()
+        self.assertTrue(board.redo())
+        self.assertFalse(board.first)
+        self.assertEqual(board.truecells, truecells)
+        self.assertEqual(state(board), opened)
+
+
+
+class TestFloodFill(unittest.TestCase):
+    def testFloodFillPathsAgree(self):
+        # Big regions switch to labeling the whole board at once, which should open the same tiles
+        for seed in range(20):
+            boards = []
+            for floodruns in (minesweepergame.floodruns, 0):
+                saved = minesweepergame.floodruns
+                minesweepergame.floodruns = floodruns
+                try:
+                    board = minesweepergame.game(60, 40, 300, seed)
+                    playRandomly(board, random.Random(seed), 40)
+                finally:
+                    minesweepergame.floodruns = saved
+                boards.append(board)
+            self.assertEqual(state(boards[0]), state(boards[1]))
+
+    def testBigOpeningWithoutRecursion(self):
+        # Deep enough that a recursive fill would pass the recursion limit
+        board = minesweepergame.game(500, 500, 200, 1)
+        revealed = board.openCells(250, 250)
+        self.assertEqual(len(revealed), board.numopened)
+        self.assertEqual(len(set(revealed)), len(revealed))
+        self.assertGreater(board.numopened, 200000)
+        # The compatibility wrapper gives the same tiles as (x, y) pairs
+        board = minesweepergame.game(500, 500, 200, 1)
+        self.assertEqual(board.open(250, 250), {(i % 500, i // 500) for i in revealed})
+
+
+
+class TestSaving(unittest.TestCase):
+    def testRoundTrip(self):
+        rng = random.Random(2)
+        for seed in range(20):
+            board = minesweepergame.game(
+                rng.randint(4, 50), rng.randint(4, 50), rng.randint(5, 300), seed)
+            playRandomly(board, rng, rng.randrange(30))
+            file = io.BytesIO()
+            board.save(file)
+            file.seek(0)
+            loaded = minesweepergame.load(file)
+            self.assertEqual((loaded.width, loaded.height, loaded.numbombs, loaded.seed, loaded.first),
+                             (board.width, board.height, board.numbombs, board.seed, board.first))
+            self.assertEqual(loaded.truecells, board.truecells)
+            self.assertEqual(state(loaded), state(board))
+            # The mapped view reads the same tiles without loading the board
+            view = minesweepergame.savedgame(file.getvalue())
+            for _ in range(20):
+                x = rng.randrange(board.width)
+                y = rng.randrange(board.height)
+                self.assertEqual(view.getVisible(x, y), board.getVisible(x, y))
+
+    def testBadFiles(self):
+        board = minesweepergame.game(20, 20, 50, 1)
+        board.openCells(10, 10)
+        file = io.BytesIO()
+        board.save(file)
+        data = file.getvalue()
+        for bad in (data[:10], b"XXXX" + data[4:], data[:-1]):
+            with self.assertRaises(ValueError):
+                minesweepergame.load(io.BytesIO(bad))
+
+    def testSavingToPath(self):
+        board = minesweepergame.game(30, 20, 80, 4)
+        board.openCells(3, 3)
+        board.flag(0, 19)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "game.msw")
+            board.save(path)
+            self.assertEqual(state(minesweepergame.load(path)), state(board))
+            view = minesweepergame.savedgame(path)
+            self.assertEqual(view.getVisible(0, 19), "F")
+            # Unmaps the file, since Windows can't delete a mapped file
+            del view
+
+
+
+class TestBatches(unittest.TestCase):
+    def testOpenManyMatchesOpens(self):
+        rng = random.Random(3)
+        for seed in range(20):
+            cells = [(rng.randrange(30), rng.randrange(20)) for _ in range(10)]
+            single = minesweepergame.game(30, 20, 60, seed)
+            for x, y in cells:
+                if single.isGameOver():
+                    break
+                single.openCells(x, y)
+            batch = minesweepergame.game(30, 20, 60, seed)
+            revealed = batch.openMany(cells)
+            self.assertEqual(state(batch), state(single))
+            self.assertEqual(sorted(revealed), [i for i, tile in enumerate(batch.visiblecells) if tile == 1])
+            self.assertEqual(batch.moves, 1)
+            batch.undo()
+            self.assertEqual(batch.numopened, 0)
+
+    def testOpenManyStopsAtBomb(self):
+        board = minesweepergame.game(16, 16, 40, 2)
+        board.openCells(0, 0)
+        bomb = board.truecells.index(-1)
+        safe = [i for i, tile in enumerate(board.truecells) if tile > 0 and board.visiblecells[i] == 0]
+        revealed = board.openMany([(safe[0] % 16, safe[0] // 16), (bomb % 16, bomb // 16),
+                                   (safe[1] % 16, safe[1] // 16)])
+        self.assertEqual(list(revealed), [safe[0], bomb])
+        self.assertTrue(board.isGameOver())
+        self.assertEqual(board.visiblecells[safe[1]], 0)
+
+    def testWinningLeavesFlaggedBombs(self):
+        board = minesweepergame.game(12, 12, 20, 6)
+        board.openCells(6, 6)
+        bombs = [(i % 12, i // 12) for i, tile in enumerate(board.truecells) if tile == -1]
+        self.assertEqual(len(board.flagMany(bombs)), len(bombs))
+        # Opening a flagged tile opens it, but the move stops once won, before reaching the bombs at the end
+        safe = [(i % 12, i // 12) for i, tile in enumerate(board.truecells) if tile != -1]
+        board.openMany(safe + bombs)
+        self.assertTrue(board.isVictory())
+        self.assertFalse(board.isGameOver())
+        self.assertEqual(board.numcorrectflags, len(bombs))
+        # Nothing changes once the game is won
+        self.assertEqual(len(board.flagMany(bombs)), 0)
+
+    def testChord(self):
+        board = minesweepergame.game(16, 16, 40, 8)
+        board.openCells(8, 8)
+        # An opened number with an unopened neighbor
+        width = board.width
+        index = next(i for i, tile in enumerate(board.truecells) if tile > 0 and board.visiblecells[i] == 1 and any(
+            board.visiblecells[n] == 0 for n in self.neighbors(i, width, board.height)))
+        x, y = index % width, index // width
+        neighbors = self.neighbors(index, width, board.height)
+        self.assertEqual(len(board.chord(x, y)), 0)  # Not enough flags yet
+        board.flagMany([(n % width, n // width) for n in neighbors if board.truecells[n] == -1])
+        unopened = sorted(n for n in neighbors if board.visiblecells[n] == 0)
+        revealed = board.chord(x, y)
+        self.assertFalse(board.isGameOver())
+        self.assertTrue(set(unopened) <= set(revealed))
+        self.assertTrue(all(board.visiblecells[n] != 0 for n in neighbors))
+
+    @staticmethod
+    def neighbors(index: int, width: int, height: int) -> List[int]:
+        x, y = index % width, index // width
+        return [ny * width + nx for ny in range(max(0, y - 1), min(height, y + 2))
+                for nx in range(max(0, x - 1), min(width, x + 2)) if (nx, ny) != (x, y)]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests for unbounded boards.
+
+Run with `python -m unittest test_minesweeperinfinite` or `python -m pytest`.
+"""
+import random
+import unittest
+
+import minesweeperinfinite
+
+
+def play(board: minesweeperinfinite.infinitegame, rng: random.Random, moves: int):
+    """
+    Opens and flags random tiles around the origin, continuing every flood fill.
+    """
+    board.open(0, 0)
+    for _ in range(moves):
+        x = rng.randrange(-100, 100)
+        y = rng.randrange(-100, 100)
+        if rng.random() < 0.3:
+            board.flag(x, y)
+        elif board.getTrue(x, y) != "Q":  # Keep playing instead of losing
+            board.open(x, y)
+        while board.pending:
+            board.expand()
+
+
+class TestInfinite(unittest.TestCase):
+    def testSameAfterEviction(self):
+        for seed in range(5):
+            # One board keeps every chunk, and the other only a few
+            boards = [minesweeperinfinite.infinitegame(0.15, seed, chunksize=16, maxresident=maxresident)
+                      for maxresident in (100000, 4)]
+            for board in boards:
+                play(board, random.Random(seed), 100)
+            kept, evicted = boards
+            self.assertGreater(len(evicted.stored), 0)
+            self.assertEqual((evicted.numopened, evicted.numflags), (kept.numopened, kept.numflags))
+            self.assertEqual(evicted.view(-110, -110, 220, 220), kept.view(-110, -110, 220, 220))
+
+    def testCountsCrossChunks(self):
+        board = minesweeperinfinite.infinitegame(0.3, 7, chunksize=8)
+        mines = {}
+
+        def isMine(x: int, y: int) -> bool:
+            key = (x >> 3, y >> 3)
+            if key not in mines:
+                mines[key] = board.mines(*key)
+            return mines[key][(y & 7) << 3 | (x & 7)] == 1
+        for y in range(-12, 12):
+            for x in range(-12, 12):
+                if isMine(x, y):
+                    self.assertEqual(board.getTrue(x, y), "Q")
+                else:
+                    count = sum(isMine(x + dx, y + dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1))
+                    self.assertEqual(board.getTrue(x, y), str(count))
+        # The first move is always safe
+        self.assertIsNotNone(board.open(0, 0))
+
+    def testFloodLimit(self):
+        limited = minesweeperinfinite.infinitegame(0.15, 3, floodlimit=50)
+        unlimited = minesweeperinfinite.infinitegame(0.15, 3)
+        revealed = limited.open(0, 0)
+        everything = unlimited.open(0, 0)
+        self.assertGreater(len(everything), 50)
+        self.assertLessEqual(len(revealed), 50)
+        while limited.pending:
+            revealed += limited.expand()
+        self.assertEqual(sorted(revealed), sorted(everything))
+        self.assertEqual(limited.numopened, unlimited.numopened)
+
+    def testChunkSizeMustBePowerOfTwo(self):
+        with self.assertRaises(ValueError):
+            minesweeperinfinite.infinitegame(chunksize=48)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Tests for the pool of pre-generated board layouts and no-guess checking.
+"""
+import os
+import tempfile
+import time
+import unittest
+from array import array
+from concurrent import futures
+
+import minesweepergame
+import minesweeperpool
+
+
+class TestLayouts(unittest.TestCase):
+    def testNoGuessLayoutsMatchGames(self):
+        for seed in range(3):
+            made = minesweeperpool.makeLayout(9, 9, 10, 4, 4, noguess=True, seed=seed)
+            self.assertIsNotNone(made)
+            layoutseed, truecells = made
+            layout = array("b", truecells)
+            self.assertTrue(minesweeperpool.isNoGuess(layout, 9, 9, 4, 4))
+            # A game with the layout's seed makes the same board from the same first tile
+            board = minesweepergame.game(9, 9, 10, layoutseed)
+            board.openCells(4, 4)
+            self.assertEqual(board.truecells, layout)
+
+    def testGuessingIsDetected(self):
+        # Opening the top row leaves a bomb in each of the two pairs of tiles in the third row,
+        # and nothing tells which tile of each pair it is
+        layout = array("b", [0, 0, 0, 0, 0,
+                             1, 1, 1, 1, 1,
+                             -1, 1, 1, -1, 1,
+                             1, 1, 1, 1, 1])
+        self.assertFalse(minesweeperpool.isNoGuess(layout, 5, 4, 0, 0))
+
+    def testBudget(self):
+        start = time.monotonic()
+        self.assertIsNone(minesweeperpool.makeLayout(
+            60, 60, 1000, 30, 30, noguess=True, seed=1, budget=0.5))
+        self.assertLess(time.monotonic() - start, 5)
+
+    def testBigBoardsAreNeverNoGuess(self):
+        pool = minesweeperpool.boardpool()
+        self.assertTrue(pool.key(30, 16, 99, 0, 0, True)[5])
+        self.assertFalse(pool.key(200, 200, 99, 0, 0, True)[5])
+
+
+class TestPool(unittest.TestCase):
+    def testCachedLayoutsAreSharedOnce(self):
+        with tempfile.TemporaryDirectory() as cachedir:
+            executor = futures.ThreadPoolExecutor(1)
+            pool = minesweeperpool.boardpool(size=2, cachedir=cachedir, executor=executor)
+            key = pool.key(9, 9, 10, 4, 4, True)
+            pool.warm(9, 9, 10, 4, 4, noguess=True)
+            while pool.inflight[key] > 0:
+                time.sleep(0.01)
+            self.assertEqual(len(os.listdir(cachedir)), 2)
+            # Another pool takes the same layouts from the cache, deleting each file as it claims it
+            other = minesweeperpool.boardpool(size=2, cachedir=cachedir, executor=executor)
+            taken = [other.take(9, 9, 10, 4, 4, noguess=True) for _ in range(2)]
+            self.assertEqual(sorted(seed for seed, _ in taken),
+                             sorted(seed for seed, _, _ in pool.pools[key]))
+            for _, truecells in taken:
+                self.assertTrue(minesweeperpool.isNoGuess(truecells, 9, 9, 4, 4))
+            # So the first pool can't hand them out again
+            self.assertIsNone(pool.take(9, 9, 10, 4, 4, noguess=True))
+            executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
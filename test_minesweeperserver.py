@@ -0,0 +1,93 @@
+"""
+Tests for the game server's line-delimited JSON protocol.
+"""
+import asyncio
+import json
+import unittest
+from typing import Dict
+
+import minesweeperserver
+
+
+class TestProtocol(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = minesweeperserver.server(maxtiles=1000000)
+
+    async def asyncTearDown(self):
+        if self.server.executor is not None:
+            self.server.executor.shutdown()
+
+    async def request(self, **message) -> Dict:
+        return await self.server.respond(json.dumps(message).encode())
+
+    async def testOpenAndFlag(self):
+        started = await self.request(op="new", width=9, height=9, bombs=10, seed=1, id=7)
+        self.assertTrue(started["ok"])
+        self.assertEqual(started["id"], 7)
+        key = started["session"]
+        board = self.server.sessions[key].board
+        opened = await self.request(op="open", session=key, x=4, y=4)
+        self.assertTrue(opened["ok"])
+        self.assertEqual(opened["state"], "playing")
+        for x, y, tile in opened["cells"]:
+            self.assertEqual(str(tile), board.getVisible(x, y))
+        # Flag an unopened tile, then take the flag off again
+        index = board.visiblecells.index(0)
+        x, y = index % 9, index // 9
+        flagged = await self.request(op="flag", session=key, x=x, y=y)
+        self.assertEqual((flagged["changed"], flagged["flagged"]), (True, True))
+        state = await self.request(op="state", session=key, board=True)
+        self.assertEqual(state["flags"], 1)
+        self.assertEqual(state["board"][y][x], "F")
+        self.assertEqual(state["opened"], len(opened["cells"]))
+        flagged = await self.request(op="flag", session=key, x=x, y=y)
+        self.assertEqual((flagged["changed"], flagged["flagged"]), (True, False))
+        self.assertTrue((await self.request(op="close", session=key))["ok"])
+        self.assertFalse((await self.request(op="state", session=key))["ok"])
+
+    async def testBadRequests(self):
+        key = (await self.request(op="new"))["session"]
+        for message in ({"op": "open", "session": key, "x": 1e999, "y": 0},
+                        {"op": "open", "session": key, "x": 9, "y": 0},
+                        {"op": "new", "width": 1e999},
+                        {"op": "new", "width": 2000, "height": 2000},
+                        {"op": "jump"}):
+            response = await self.server.respond(json.dumps(message).encode())
+            self.assertFalse(response["ok"], message)
+            self.assertIsInstance(response["error"], str)
+        self.assertFalse((await self.server.respond(b"[1, 2"))["ok"])
+
+    async def testBigOpeningsAreSentAsRows(self):
+        key = (await self.request(op="new", width=1000, height=500, bombs=5000, seed=2))["session"]
+        board = self.server.sessions[key].board
+        opened = await self.request(op="open", session=key, x=500, y=250)
+        self.assertNotIn("cells", opened)
+        tiles = 0
+        for y, x, symbols in opened["rows"]:
+            for offset, symbol in enumerate(symbols):
+                if symbol != ".":
+                    tiles += 1
+                    self.assertEqual(symbol, board.getVisible(x + offset, y))
+        self.assertEqual(tiles, board.numopened)
+
+    async def testConnection(self):
+        listener = await self.server.serve("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        # Pipelined requests are answered in order
+        writer.write(b'{"op": "new", "seed": 3, "id": 1}\n{"op": "nope", "id": 2}\n')
+        started = json.loads(await reader.readline())
+        failed = json.loads(await reader.readline())
+        self.assertEqual((started["id"], started["ok"]), (1, True))
+        self.assertEqual((failed["id"], failed["ok"]), (2, False))
+        writer.write(json.dumps({"op": "open", "session": started["session"], "x": 0, "y": 0}).encode() + b"\n")
+        self.assertTrue(json.loads(await reader.readline())["ok"])
+        writer.close()
+        await writer.wait_closed()
+        listener.close()
+        await listener.wait_closed()
+        self.server.expiry.cancel()
+
+
+if __name__ == "__main__":
+    unittest.main()
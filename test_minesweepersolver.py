@@ -0,0 +1,94 @@
+"""
+Tests for the solver.
+
+Run with `python -m unittest test_minesweepersolver` or `python -m pytest`.
+"""
+import itertools
+import random
+import unittest
+
+import minesweeperbatch
+import minesweepergame
+import minesweepersolver
+
+
+class TestSolver(unittest.TestCase):
+    def testDeductionsAreTrue(self):
+        for seed in range(20):
+            board = minesweepergame.game(30, 16, 99, seed)
+            boardsolver = minesweepersolver.solver(board)
+            boardsolver.update(board.openCells(15, 8))
+            while not board.isGameOver() and not board.isVictory():
+                result = boardsolver.solve()
+                for x, y in result.safe:
+                    self.assertNotEqual(board.truecells[y * board.width + x], -1)
+                for x, y in result.mines:
+                    self.assertEqual(board.truecells[y * board.width + x], -1)
+                for chance in result.probabilities.values():
+                    self.assertTrue(0 < chance < 1)
+                if result.safe:
+                    x, y = min(result.safe)
+                    boardsolver.update(board.openCells(x, y))
+                elif result.mines:
+                    x, y = min(result.mines)
+                    board.flag(x, y)
+                    boardsolver.update((y * board.width + x,))
+                else:
+                    break  # Only guesses are left
+
+    def testIncrementalIndexMatchesRebuilding(self):
+        rng = random.Random(4)
+        for seed in range(10):
+            board = minesweepergame.game(40, 30, 200, seed)
+            boardsolver = minesweepersolver.solver(board)
+            for _ in range(30):
+                x = rng.randrange(40)
+                y = rng.randrange(30)
+                if rng.random() < 0.3:  # The solver trusts flags, so only bombs are flagged
+                    if board.truecells[y * 40 + x] == -1 and board.flag(x, y):
+                        boardsolver.update((y * 40 + x,))
+                else:
+                    revealed = board.openCells(x, y)
+                    if board.isGameOver():
+                        break
+                    boardsolver.update(revealed)
+                rebuilt = minesweepersolver.solver(board)
+                self.assertEqual(boardsolver.constraints, rebuilt.constraints)
+                self.assertEqual(boardsolver.frontier, rebuilt.frontier)
+                incremental = boardsolver.solve(probabilities=False)
+                fresh = rebuilt.solve(probabilities=False)
+                self.assertEqual((incremental.safe, incremental.mines), (fresh.safe, fresh.mines))
+
+    def testEnumerationFindsEveryCertainTile(self):
+        # Tiles that are the same in every bomb layout of the frontier that fits the visible numbers
+        checked = 0
+        for seed in range(60):
+            board = minesweepergame.game(7, 6, 10, seed)
+            board.openCells(0, 0)
+            boardsolver = minesweepersolver.solver(board)
+            frontier = sorted(boardsolver.frontier)
+            if board.isVictory() or len(frontier) > 14:
+                continue
+            layouts = []
+            for bombs in itertools.product((False, True), repeat=len(frontier)):
+                isbomb = dict(zip(frontier, bombs))
+                if all(sum(isbomb[n] for n in unknowns) == board.truecells[constraint]
+                       for constraint, unknowns in boardsolver.constraints.items()):
+                    layouts.append(bombs)
+            result = boardsolver.solve()
+            safe = {(frontier[i] % 7, frontier[i] // 7) for i in range(len(frontier))
+                    if not any(layout[i] for layout in layouts)}
+            mines = {(frontier[i] % 7, frontier[i] // 7) for i in range(len(frontier))
+                     if all(layout[i] for layout in layouts)}
+            self.assertEqual((result.safe, result.mines), (safe, mines))
+            checked += 1
+        self.assertGreater(checked, 20)
+
+
+    def testPolicyWinsBeginnerGames(self):
+        results = [minesweeperbatch.playGame(9, 9, 10, seed, minesweepersolver.solverPolicy) for seed in range(50)]
+        self.assertGreater(sum(result["victory"] for result in results), 35)
+
+
+if __name__ == "__main__":
+    unittest.main()
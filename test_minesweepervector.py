@@ -0,0 +1,75 @@
+"""
+Regression tests for the vectorized engine.
+
+Run with `python -m unittest test_minesweepervector` or `python -m pytest`.
+"""
+import random
+import unittest
+
+import minesweepergame
+
+try:
+    import numpy
+
+    import minesweepervector
+except ImportError:  # The vectorized engine needs NumPy
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "The vectorized engine needs NumPy.")
+class TestVector(unittest.TestCase):
+    def testMatchesGame(self):
+        for count, width, height, bombs, firstseed in ((60, 9, 9, 10, 0), (30, 16, 16, 40, 100), (40, 4, 4, 8, 7)):
+            boards = minesweepervector.vectorgame(
+                count, width, height, bombs, range(firstseed, firstseed + count))
+            games = [minesweepergame.game(width, height, bombs, firstseed + i)
+                     for i in range(count)]
+            rng = random.Random(firstseed)
+            for _ in range(80):
+                # Flags can't be placed before the first open
+                codes = [1 if board.first or rng.random() < 0.7 else 2 for board in games]
+                xs = [rng.randrange(width) for _ in games]
+                ys = [rng.randrange(height) for _ in games]
+                boards.step(numpy.array(codes), numpy.array(xs), numpy.array(ys))
+                for board, code, x, y in zip(games, codes, xs, ys):
+                    if code == 1:
+                        board.openCells(x, y)
+                    else:
+                        board.flag(x, y)
+            won = boards.isVictory()
+            lost = boards.isGameOver()
+            for i, board in enumerate(games):
+                self.assertEqual(boards.visiblecells[i].tobytes(), board.visiblecells.tobytes())
+                if not board.first:
+                    self.assertEqual(boards.truecells[i].tobytes(), board.truecells.tobytes())
+                self.assertEqual((bool(won[i]), bool(lost[i])), (board.isVictory(), board.isGameOver()))
+                self.assertEqual((int(boards.numopened[i]), int(boards.numcorrectflags[i]), int(boards.numwrongflags[i])),
+                                 (board.numopened, board.numcorrectflags, board.numwrongflags))
+
+    def testBoardsCopyIntoGames(self):
+        boards = minesweepervector.vectorgame(20, 16, 16, 40, range(20))
+        rng = numpy.random.default_rng(0)
+        for _ in range(5):
+            boards.step(*minesweepervector.randomPolicy(boards, rng))
+        # Keeping some boards keeps their seeds with them
+        boards.select(numpy.arange(19, -1, -2))
+        for i, seed in enumerate(range(19, -1, -2)):
+            single = boards.game(i)
+            self.assertEqual(single.seed, seed)
+            self.assertEqual(single.visiblecells.tobytes(), boards.visiblecells[i].tobytes())
+            self.assertEqual(single.isGameOver(), bool(boards.isGameOver()[i]))
+            if not single.first:
+                self.assertEqual(single.truecells.tobytes(), boards.truecells[i].tobytes())
+
+    def testBatchesAreReproducible(self):
+        first = minesweepervector.runBatch(5, 5, 2, 500, 1, chunksize=128)
+        second = minesweepervector.runBatch(5, 5, 2, 500, 1, chunksize=128)
+        self.assertEqual((first["wins"], first["moves"]), (second["wins"], second["moves"]))
+        self.assertEqual(first["games"], 500)
+        self.assertTrue(0 < first["wins"] < 500)
+        with self.assertRaises(ValueError):
+            minesweepervector.runBatch(9, 9, 10, 10, 1, policyname="unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()